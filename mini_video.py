@@ -1,26 +1,111 @@
 import os
+import hmac
+import base64
+import hashlib
+import time
+import queue
 import sqlite3
+from functools import wraps
+from urllib.parse import quote
 from flask import (
     Flask, g, render_template, request,
     redirect, url_for, flash, send_from_directory, jsonify
 )
 from flask_login import (
     LoginManager, UserMixin,
-    login_user, login_required,
-    logout_user, current_user
+    login_user, logout_user, current_user,
+    login_required as flask_login_required
 )
+from flask.sessions import SecureCookieSessionInterface
+from flask_login.config import EXEMPT_METHODS
 from werkzeug.utils import secure_filename
+from werkzeug.security import generate_password_hash, check_password_hash
 from jinja2 import DictLoader
 
+# 可选：bcrypt 密码哈希（C 实现），未安装时回退到 Werkzeug 的 PBKDF2
+try:
+    import bcrypt
+    hasBcrypt = True
+except ImportError:
+    hasBcrypt = False
+
+# 可选：Flask-Session + Redis 服务端会话，未安装时继续使用签名 Cookie 会话
+try:
+    from flask_session import Session
+    import redis
+    hasRedisSession = True
+except ImportError:
+    hasRedisSession = False
+
+# 可选：orjson（C 实现的 JSON 编解码），用于签名 Cookie 会话的序列化
+try:
+    import orjson
+    hasOrjson = True
+except ImportError:
+    hasOrjson = False
+
 # ——— 配置 —————————————————————————————————————————————————————————————————————————
 DATABASE_PATH        = 'video.db'
 UPLOAD_FOLDER        = 'uploads'
 ALLOWED_EXTENSIONS   = {'mp4', 'webm', 'ogg'}
+DB_POOL_SIZE         = 8    # 连接池中最多保留的空闲连接数
+DASHBOARD_CACHE_TTL  = 15   # 管理中心视频列表的缓存秒数
+DASHBOARD_CACHE_MAX  = 10000
+# bcrypt 成本因子：每加 1 耗时翻倍，调到目标机器上单次校验约 250 ms
+BCRYPT_ROUNDS        = int(os.getenv('BCRYPT_ROUNDS', '11'))
+# 会话存储的 Redis 地址，例如 unix:///var/run/redis/redis.sock（本机 Unix 套接字，省去 TCP 开销）；
+# 为空时使用默认的签名 Cookie 会话
+SESSION_REDIS_URL    = os.getenv('SESSION_REDIS_URL', '')
+# Bootstrap：static/ 下有带版本号的本地副本时由本站提供，否则退回 CDN
+BOOTSTRAP_CDN_URL    = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist'
+BOOTSTRAP_CSS_FILE   = 'bootstrap-5.3.0.min.css'
+BOOTSTRAP_JS_FILE    = 'bootstrap-5.3.0.bundle.min.js'
+STATIC_CACHE_CONTROL = 'public, max-age=31536000, immutable'
 
 app = Flask(__name__)
 app.config['SECRET_KEY']    = 'you-will-never-guess'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# 会话放到 Redis 后，Cookie 里只剩会话 ID，每个请求不再对整个会话做签名校验和反序列化
+if hasRedisSession and SESSION_REDIS_URL:
+    app.config['SESSION_TYPE']  = 'redis'
+    app.config['SESSION_REDIS'] = redis.from_url(SESSION_REDIS_URL)
+    Session(app)
+elif hasOrjson:
+    class OrjsonSessionSerializer:
+        """会话 Cookie 的 orjson 序列化器；会话里只有字符串、布尔和闪现消息列表，无需 Flask 的类型标签。"""
+        def dumps(self, value):
+            # 签名串需要文本类型，Cookie 才能按 str 写出
+            return orjson.dumps(value).decode()
+
+        def loads(self, value):
+            return orjson.loads(value)
+
+    class OrjsonSessionInterface(SecureCookieSessionInterface):
+        """签名 Cookie 会话，载荷改用 orjson 编解码，每个请求/响应都省下一次纯 Python 的 JSON 处理。"""
+        # 换用独立的 salt：旧格式的 Cookie 签名校验失败后按新会话处理，不会被误解析
+        salt = 'cookie-session-orjson'
+        serializer = OrjsonSessionSerializer()
+
+    app.session_interface = OrjsonSessionInterface()
+
+# 静态资源文件名带版本号，内容永不变化：本地副本存在时页面直接引用，浏览器可长期从磁盘缓存读取，
+# 首屏不再依赖外部 CDN 的 DNS/TLS 往返
+STATIC_URL_PREFIX = app.static_url_path + '/'
+if all(os.path.isfile(os.path.join(app.static_folder, name)) for name in (BOOTSTRAP_CSS_FILE, BOOTSTRAP_JS_FILE)):
+    app.jinja_env.globals['bootstrap_css_url'] = STATIC_URL_PREFIX + BOOTSTRAP_CSS_FILE
+    app.jinja_env.globals['bootstrap_js_url']  = STATIC_URL_PREFIX + BOOTSTRAP_JS_FILE
+else:
+    app.jinja_env.globals['bootstrap_css_url'] = BOOTSTRAP_CDN_URL + '/css/bootstrap.min.css'
+    app.jinja_env.globals['bootstrap_js_url']  = BOOTSTRAP_CDN_URL + '/js/bootstrap.bundle.min.js'
+
+@app.after_request
+def add_static_cache_headers(response):
+    """为 /static/ 下的资源加上长期缓存头。"""
+    if request.path.startswith(STATIC_URL_PREFIX) and response.status_code in (200, 304):
+        response.headers['Cache-Control'] = STATIC_CACHE_CONTROL
+    return response
+
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
@@ -32,21 +117,21 @@ templates = {
 <head>
   <meta charset="UTF-8">
   <title>{% block title %}视频平台{% endblock %}</title>
-  <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+  <link href="{{ bootstrap_css_url }}" rel="stylesheet">
   <style>body{padding-top:70px}.video-thumb{width:100%;height:auto}</style>
 </head>
 <body>
 <nav class="navbar navbar-expand-lg navbar-dark bg-dark fixed-top">
   <div class="container-fluid">
-    <a class="navbar-brand" href="{{ url_for('index') }}">视频平台</a>
+    <a class="navbar-brand" href="{{ urls.index }}">视频平台</a>
     <button class="navbar-toggler" type="button" data-bs-toggle="collapse" data-bs-target="#navbarMenu">
       <span class="navbar-toggler-icon"></span>
     </button>
     <div class="collapse navbar-collapse" id="navbarMenu">
       <ul class="navbar-nav me-auto">
-        <li class="nav-item"><a class="nav-link" href="{{ url_for('index') }}">首页</a></li>
+        <li class="nav-item"><a class="nav-link" href="{{ urls.index }}">首页</a></li>
         {% if current_user.is_authenticated %}
-        <li class="nav-item"><a class="nav-link" href="{{ url_for('dashboard') }}">管理中心</a></li>
+        <li class="nav-item"><a class="nav-link" href="{{ urls.dashboard }}">管理中心</a></li>
         {% endif %}
       </ul>
       <form class="d-flex me-3" method="post" action="{{ url_for('search') }}">
@@ -55,11 +140,11 @@ templates = {
       </form>
       <ul class="navbar-nav">
         {% if current_user.is_authenticated %}
-          <li class="nav-item"><a class="nav-link" href="{{ url_for('profile',username=current_user.username) }}">{{ current_user.username }}</a></li>
-          <li class="nav-item"><a class="nav-link" href="{{ url_for('logout') }}">登出</a></li>
+          <li class="nav-item"><a class="nav-link" href="{{ profile_url(current_user.username) }}">{{ current_user.username }}</a></li>
+          <li class="nav-item"><a class="nav-link" href="{{ urls.logout }}">登出</a></li>
         {% else %}
-          <li class="nav-item"><a class="nav-link" href="{{ url_for('login') }}">登录</a></li>
-          <li class="nav-item"><a class="nav-link" href="{{ url_for('register') }}">注册</a></li>
+          <li class="nav-item"><a class="nav-link" href="{{ urls.login }}">登录</a></li>
+          <li class="nav-item"><a class="nav-link" href="{{ urls.register }}">注册</a></li>
         {% endif %}
       </ul>
     </div>
@@ -75,7 +160,7 @@ templates = {
   {% endwith %}
   {% block content %}{% endblock %}
 </div>
-<script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+<script src="{{ bootstrap_js_url }}"></script>
 </body>
 </html>
 ''',
@@ -88,8 +173,8 @@ templates = {
   {% for video in videos %}
   <div class="col-md-4 mb-4">
     <div class="card">
-      <a href="{{ url_for('play_video', filename=video.filename) }}">
-        <img src="{{ url_for('play_video', filename=video.filename) }}" class="card-img-top video-thumb">
+      <a href="{{ play_url(video.filename) }}">
+        <img src="{{ play_url(video.filename) }}" class="card-img-top video-thumb">
       </a>
       <div class="card-body">
         <h5 class="card-title">{{ video.title }}</h5>
@@ -145,13 +230,13 @@ templates = {
 {% block title %}管理中心 - 视频平台{% endblock %}
 {% block content %}
 <h2 class="mb-4">我的视频管理</h2>
-<a href="{{ url_for('upload_video') }}" class="btn btn-success mb-3">上传新视频</a>
+<a href="{{ urls.upload_video }}" class="btn btn-success mb-3">上传新视频</a>
 <table class="table table-hover">
   <thead><tr><th>预览</th><th>标题</th><th>状态</th><th>操作</th></tr></thead>
   <tbody>
     {% for video in videos %}
     <tr id="row-{{ video.id }}">
-      <td><video src="{{ url_for('play_video', filename=video.filename) }}" width="120" controls muted></video></td>
+      <td><video src="{{ play_url(video.filename) }}" width="120" controls muted></video></td>
       <td>{{ video.title }}</td>
       <td class="status-{{ video.id }}">
         {% if video.is_public %}<span class="badge bg-success">公开</span>{% else %}<span class="badge bg-secondary">隐藏</span>{% endif %}
@@ -208,8 +293,8 @@ function deleteVideo(videoId) {
   {% for video in videos %}
   <div class="col-md-4 mb-4">
     <div class="card">
-      <a href="{{ url_for('play_video', filename=video.filename) }}">
-        <video src="{{ url_for('play_video', filename=video.filename) }}" class="card-img-top video-thumb" controls muted></video>
+      <a href="{{ play_url(video.filename) }}">
+        <video src="{{ play_url(video.filename) }}" class="card-img-top video-thumb" controls muted></video>
       </a>
       <div class="card-body">
         <h5 class="card-title">{{ video.title }}</h5>
@@ -223,27 +308,62 @@ function deleteVideo(videoId) {
 '''
 }
 app.jinja_loader = DictLoader(templates)
+# 模板都在上面的字典里、运行期不会变化：关闭自动重载检查，并在导入时一次性编译进缓存
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+for template_name in templates:
+    app.jinja_env.get_template(template_name)
 
 # ——— 数据库工具 —————————————————————————————————————————————————————————————————————————
+# 进程级连接池：LIFO 取用最近归还的连接，其页缓存最热
+db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+def open_db_connection():
+    """新建一个可跨线程复用的 SQLite 连接并设置行工厂。"""
+    # 语句缓存按 SQL 文本命中，池化后的长连接可一直复用已编译的语句，跳过每次的解析和规划；
+    # 自动提交模式：单条写语句自成事务，不再隐式 BEGIN，多条写入需显式 BEGIN IMMEDIATE ... COMMIT
+    connection = sqlite3.connect(
+        DATABASE_PATH, check_same_thread=False, cached_statements=256, isolation_level=None
+    )
+    connection.row_factory = sqlite3.Row
+    # 以下 PRAGMA 只对当前连接生效，每个新连接都要设置；WAL 模式下 NORMAL 不会损坏数据库
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA temp_store=MEMORY")
+    connection.execute("PRAGMA mmap_size=268435456")
+    return connection
+
 def get_db_connection():
-    """获取 SQLite 连接并设置行工厂。"""
+    """从连接池取出 SQLite 连接，池为空时新建；同一请求内复用同一连接。"""
     if 'db_connection' not in g:
-        connection = sqlite3.connect(DATABASE_PATH)
-        connection.row_factory = sqlite3.Row
-        g.db_connection = connection
+        try:
+            g.db_connection = db_pool.get_nowait()
+        except queue.Empty:
+            g.db_connection = open_db_connection()
     return g.db_connection
 
 @app.teardown_appcontext
 def close_db_connection(exception):
-    """关闭数据库连接。"""
+    """请求结束时把连接归还连接池，池满时才真正关闭。"""
     connection = g.pop('db_connection', None)
     if connection:
-        connection.close()
+        # 连接同一时刻只属于一个请求；归还前回滚未完成的显式事务，避免带到下一个请求
+        if connection.in_transaction:
+            connection.rollback()
+        try:
+            db_pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
 
 def initialize_database():
     """初始化数据库表结构。"""
-    db = get_db_connection()
-    db.executescript("""
+    # 用一条专用连接、用完即关，不放进连接池：导入期建立的连接若留在池中，
+    # 预加载（gunicorn --preload）后 fork 出的各 worker 会共用它，SQLite 不允许跨 fork 使用连接
+    db = open_db_connection()
+    try:
+        # WAL 写入数据库文件后持久生效：提交只追加日志，读不阻塞写
+        db.execute("PRAGMA journal_mode=WAL")
+        # 建表、建索引放进同一个事务，只落盘一次
+        db.executescript("""
+BEGIN IMMEDIATE;
 -- 用户表
 CREATE TABLE IF NOT EXISTS users (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -261,8 +381,16 @@ CREATE TABLE IF NOT EXISTS videos (
   user_id INTEGER NOT NULL,
   FOREIGN KEY(user_id) REFERENCES users(id)
 );
+-- 管理中心：按用户取视频并按 id 倒序，索引直接给出有序结果，无需临时排序
+CREATE INDEX IF NOT EXISTS idx_videos_user_id ON videos(user_id, id DESC);
+-- 个人主页：某用户的公开视频
+CREATE INDEX IF NOT EXISTS idx_videos_user_public_id ON videos(user_id, is_public, id DESC);
+-- 首页：全部公开视频
+CREATE INDEX IF NOT EXISTS idx_videos_public_id ON videos(is_public, id DESC);
+COMMIT;
 """)
-    db.commit()
+    finally:
+        db.close()
 
 # ——— 用户模型 —————————————————————————————————————————————————————————————————————————
 class User(UserMixin):
@@ -281,6 +409,66 @@ def load_user_by_id(user_id):
     ).fetchone()
     return User(row) if row else None
 
+# bcrypt 只接受 72 字节以内的输入（新版超长直接报错）：先做 SHA-256 再 base64 成 44 字节交给 bcrypt，
+# 存储时加上这个前缀，与早先直接对原文做 bcrypt 的哈希区分
+BCRYPT_SHA256_PREFIX = 'bcrypt-sha256:'
+
+def bcrypt_prehash(password):
+    """把任意长度的密码压缩成 44 字节的 bcrypt 输入。"""
+    return base64.b64encode(hashlib.sha256(password.encode()).digest())
+
+def hash_password(password):
+    """生成密码哈希：优先 bcrypt（SHA-256 预哈希），否则使用 Werkzeug 默认算法。"""
+    if hasBcrypt:
+        hashed = bcrypt.hashpw(bcrypt_prehash(password), bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+        return BCRYPT_SHA256_PREFIX + hashed.decode()
+    return generate_password_hash(password)
+
+def verify_password(stored, password):
+    """校验密码；兼容 bcrypt、Werkzeug 哈希以及旧版本留下的明文密码。"""
+    if stored.startswith(BCRYPT_SHA256_PREFIX):
+        return hasBcrypt and bcrypt.checkpw(bcrypt_prehash(password), stored[len(BCRYPT_SHA256_PREFIX):].encode())
+    if stored.startswith('$2'):
+        # 早先未预哈希的 bcrypt：旧版 bcrypt 会静默截断到 72 字节，这里按同样方式截断
+        return hasBcrypt and bcrypt.checkpw(password.encode()[:72], stored.encode())
+    if stored.startswith(('pbkdf2:', 'scrypt:')):
+        return check_password_hash(stored, password)
+    return hmac.compare_digest(stored.encode(), password.encode())
+
+def password_needs_rehash(stored):
+    """旧明文密码及非当前算法的哈希需要在登录成功后升级。"""
+    if hasBcrypt:
+        return not stored.startswith(BCRYPT_SHA256_PREFIX)
+    return not stored.startswith(('pbkdf2:', 'scrypt:'))
+
+# 用户不存在时也校验一次这个哈希，使两种失败的耗时一致，不泄露用户名是否存在
+DUMMY_PASSWORD_HASH = hash_password(os.urandom(16).hex())
+
+# 管理中心列表的进程内缓存：user_id -> (过期时间, 行列表)；该用户的视频有变动时立即失效。
+# 多进程部署时各进程各有一份，最多滞后 DASHBOARD_CACHE_TTL 秒
+dashboard_cache = {}
+
+def invalidate_dashboard_cache(user_id):
+    """用户上传、切换可见性或删除视频后丢弃其列表缓存。"""
+    dashboard_cache.pop(user_id, None)
+
+def login_required(view_function):
+    """
+    flask_login.login_required 的前置短路：请求既没带会话 Cookie 也没带“记住我” Cookie 时
+    必定未登录，直接跳转登录页，不再打开会话、加载用户（Redis 会话下也省去一次往返）。
+    """
+    protected_view = flask_login_required(view_function)
+
+    @wraps(view_function)
+    def wrapper(*args, **kwargs):
+        cookies = request.cookies
+        if (request.method not in EXEMPT_METHODS
+                and app.config['SESSION_COOKIE_NAME'] not in cookies
+                and app.config.get('REMEMBER_COOKIE_NAME', 'remember_token') not in cookies):
+            return login_manager.unauthorized()
+        return protected_view(*args, **kwargs)
+    return wrapper
+
 def is_file_allowed(filename):
     """检查文件扩展名是否在允许列表。"""
     return '.' in filename and filename.rsplit('.',1)[1].lower() in ALLOWED_EXTENSIONS
@@ -292,7 +480,7 @@ def index():
     """首页：显示所有公开视频。"""
     db = get_db_connection()
     videos = db.execute("""
-        SELECT v.id, v.title, v.filename, v.description, v.is_public, u.username
+        SELECT v.id, v.title, v.filename, substr(v.description, 1, 200) AS description, v.is_public, u.username
         FROM videos v
         JOIN users u ON v.user_id = u.id
         WHERE v.is_public = 1
@@ -310,9 +498,8 @@ def register():
         try:
             get_db_connection().execute(
                 'INSERT INTO users(username, password, email) VALUES(?,?,?)',
-                (username, password, email)
+                (username, hash_password(password), email)
             )
-            get_db_connection().commit()
             flash('注册成功，请登录', 'success')
             return redirect(url_for('login'))
         except sqlite3.IntegrityError:
@@ -329,7 +516,12 @@ def login():
             'SELECT * FROM users WHERE username = ?',
             (username,)
         ).fetchone()
-        if row and row['password'] == password:
+        stored = row['password'] if row else DUMMY_PASSWORD_HASH
+        password_ok = verify_password(stored, password)
+        if row and password_ok:
+            if password_needs_rehash(row['password']):
+                db = get_db_connection()
+                db.execute('UPDATE users SET password = ? WHERE id = ?', (hash_password(password), row['id']))
             login_user(User(row))
             return redirect(url_for('index'))
         flash('登录失败，请检查用户名或密码', 'danger')
@@ -360,7 +552,7 @@ def upload_video():
                 'INSERT INTO videos(title, filename, description, user_id) VALUES(?,?,?,?)',
                 (title, safe_name, description, current_user.id)
             )
-            get_db_connection().commit()
+            invalidate_dashboard_cache(current_user.id)
             flash('上传成功', 'success')
             return redirect(url_for('dashboard'))
     return render_template('upload.html')
@@ -369,10 +561,19 @@ def upload_video():
 @login_required
 def dashboard():
     """管理中心：用户自己的视频列表。"""
-    user_videos = get_db_connection().execute(
-        'SELECT * FROM videos WHERE user_id = ? ORDER BY id DESC',
-        (current_user.id,)
-    ).fetchall()
+    now = time.monotonic()
+    cached = dashboard_cache.get(current_user.id)
+    if cached and cached[0] > now:
+        user_videos = cached[1]
+    else:
+        # 只取模板用到的列，不读描述
+        user_videos = get_db_connection().execute(
+            'SELECT id, title, filename, is_public FROM videos WHERE user_id = ? ORDER BY id DESC',
+            (current_user.id,)
+        ).fetchall()
+        if len(dashboard_cache) >= DASHBOARD_CACHE_MAX:
+            dashboard_cache.clear()
+        dashboard_cache[current_user.id] = (now + DASHBOARD_CACHE_TTL, user_videos)
     return render_template('dashboard.html', videos=user_videos)
 
 @app.route('/video/<int:video_id>/action', methods=['POST'])
@@ -386,25 +587,25 @@ def video_action(video_id):
     action_type = request.json.get('action')
     db = get_db_connection()
     if action_type == 'toggle':
-        row = db.execute(
-            'SELECT is_public FROM videos WHERE id = ? AND user_id = ?',
+        # 一条 UPDATE ... RETURNING（SQLite 3.35+）同时完成权限校验、翻转和读回新状态
+        # fetchall 把语句执行完，自动提交模式下写入随之提交
+        rows = db.execute(
+            'UPDATE videos SET is_public = 1 - is_public WHERE id = ? AND user_id = ? RETURNING is_public',
             (video_id, current_user.id)
-        ).fetchone()
-        if not row:
+        ).fetchall()
+        if not rows:
             return jsonify({'error':'视频不存在或无权限'}),404
-        new_visibility = 0 if row['is_public'] else 1
-        db.execute(
-            'UPDATE videos SET is_public = ? WHERE id = ?',
-            (new_visibility, video_id)
-        )
-        db.commit()
-        return jsonify({'new_state':new_visibility})
+        invalidate_dashboard_cache(current_user.id)
+        return jsonify({'new_state':rows[0]['is_public']})
     elif action_type == 'delete':
-        db.execute(
+        # 归属校验就在 WHERE 里，受影响行数为 0 即视频不存在或不属于当前用户
+        cursor = db.execute(
             'DELETE FROM videos WHERE id = ? AND user_id = ?',
             (video_id, current_user.id)
         )
-        db.commit()
+        if not cursor.rowcount:
+            return jsonify({'error':'视频不存在或无权限'}),404
+        invalidate_dashboard_cache(current_user.id)
         return jsonify({'deleted':True})
     return jsonify({'error':'无效操作'}),400
 
@@ -412,13 +613,15 @@ def video_action(video_id):
 def profile(username):
     """个人主页：查看某个用户的公开视频。"""
     row = get_db_connection().execute(
-        'SELECT * FROM users WHERE username = ?',
+        'SELECT id, username FROM users WHERE username = ?',
         (username,)
     ).fetchone()
     if not row:
         return "用户不存在",404
+    # 描述在页面上只显示一行，截取前 200 个字符即可
     public_videos = get_db_connection().execute(
-        'SELECT * FROM videos WHERE user_id = ? AND is_public = 1 ORDER BY id DESC',
+        'SELECT id, title, filename, substr(description, 1, 200) AS description FROM videos '
+        'WHERE user_id = ? AND is_public = 1 ORDER BY id DESC',
         (row['id'],)
     ).fetchall()
     return render_template('profile.html', user=row, videos=public_videos)
@@ -429,7 +632,50 @@ def play_video(filename):
     return send_from_directory(UPLOAD_FOLDER, filename)
 
 # ——— 启动 —————————————————————————————————————————————————————————————————————————
+# 路由表在导入完成后不再变化：无参数端点的 URL 用 url_for 构建一次后缓存，模板直接取 urls.xxx；
+# 带参数的播放/主页链接只做前缀拼接，省去每次渲染时 werkzeug 的 MapAdapter.build。
+# 挂载在子路径下时前缀随请求的 SCRIPT_NAME 变化，所以缓存按 request.script_root 区分
+LINK_CACHE_MAX = 64
+link_cache = {}   # script_root -> (无参数端点 URL 字典, 播放地址前缀, 主页地址前缀)
+
+def site_links():
+    """当前挂载路径下的站内链接，首次遇到某个 script_root 时构建。"""
+    script_root = request.script_root
+    links = link_cache.get(script_root)
+    if links is None:
+        links = (
+            {endpoint: url_for(endpoint)
+             for endpoint in ('index', 'dashboard', 'upload_video', 'login', 'logout', 'register')},
+            url_for('play_video', filename='_')[:-1],
+            url_for('profile', username='_')[:-1],
+        )
+        if len(link_cache) >= LINK_CACHE_MAX:
+            link_cache.clear()
+        link_cache[script_root] = links
+    return links
+
+def play_url(filename):
+    """视频文件的播放地址。"""
+    return site_links()[1] + quote(filename)
+
+def profile_url(username):
+    """用户个人主页地址。"""
+    return site_links()[2] + quote(username)
+
+@app.context_processor
+def inject_site_links():
+    """把当前挂载路径下的无参数链接提供给模板。"""
+    return {'urls': site_links()[0]}
+
+app.jinja_env.globals.update(play_url=play_url, profile_url=profile_url)
+
+# 导入时即建表、建上传目录：WSGI 服务器加载模块后、接受请求前就已完成，
+# 不会把建表耗时压在第一个请求上；建表用的连接随即关闭，连接池保持为空
+initialize_database()
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# 下面的开发服务器仅供本地调试；部署时请用多 worker 的 WSGI 服务器，
+# 配合 WAL 让读请求真正并发（每个 worker 各有自己的连接池）：
+#   gunicorn -k gthread -w 4 --threads 8 -b 0.0.0.0:5000 "mini_video:app"
 if __name__ == '__main__':
-    initialize_database()
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
@@ -517,42 +517,42 @@ def serve_index():
     """
     首页路由，返回主页 HTML
     """
-    return index_html()
+    return _page_response('index')
 
 @app.route('/register.html')
 def serve_register():
     """
     注册页面路由，返回注册页面 HTML
     """
-    return register_html()
+    return _page_response('register')
 
 @app.route('/login.html')
 def serve_login():
     """
     登录页面路由，返回登录页面 HTML
     """
-    return login_html()
+    return _page_response('login')
 
 @app.route('/upload.html')
 def serve_upload():
     """
     上传视频页面路由，返回上传页面 HTML
     """
-    return upload_html()
+    return _page_response('upload')
 
 @app.route('/my_videos.html')
 def serve_my_videos():
     """
     我的视屏列表页面路由，返回我的视频页面 HTML
     """
-    return my_videos_html()
+    return _page_response('my_videos')
 
 @app.route('/search.html')
 def serve_search():
     """
     搜索视频页面路由，返回搜索视频页面 HTML
     """
-    return search_html()
+    return _page_response('search')
 
 # =========================
 # 前端 HTML 页面定义
@@ -1028,6 +1028,9 @@ def upload_html():
 
     <!-- JavaScript 逻辑 -->
     <script>
+        // 允许的视频扩展名（由后端 ALLOWED_EXTENSIONS 填入）
+        const ALLOWED_EXTS = new Set(__ALLOWED_EXTS__);
+
         // 获取用户登录状态
         const user_id = sessionStorage.getItem('user_id');
         const username = sessionStorage.getItem('username');
@@ -1107,6 +1110,10 @@ def upload_html():
             }
 
             const file = fileInput.files[0];
+            if (!ALLOWED_EXTS.has(file.name.split('.').pop().toLowerCase())) {
+                displayResult('不允许的文件类型！', 'danger');
+                return;
+            }
             const formData = new FormData();
             formData.append('file', file);
 
@@ -1212,6 +1219,9 @@ def my_videos_html():
 
     <!-- JavaScript 逻辑 -->
     <script>
+        // 允许的视频扩展名（由后端 ALLOWED_EXTENSIONS 填入）
+        const ALLOWED_EXTS = new Set(__ALLOWED_EXTS__);
+
         // 获取用户登录状态
         const user_id = sessionStorage.getItem('user_id');
         const username = sessionStorage.getItem('username');
@@ -1355,9 +1365,10 @@ def my_videos_html():
         }
 
         function playVideo(filename) {
-            const videoUrl = `/stream/${username}/${encodeURIComponent(filename)}`;
-            const videoWindow = window.open('', '_blank');
-            videoWindow.document.write(`
+            // Blob 页面中的相对路径无法解析，这里使用完整地址
+            const videoUrl = `${location.origin}/stream/${username}/${encodeURIComponent(filename)}`;
+            // 用 Blob URL 打开播放页，避免 document.write 造成的同步解析停顿
+            const blob = new Blob([`
                 <!DOCTYPE html>
                 <html lang="zh-CN">
                 <head>
@@ -1368,7 +1379,11 @@ def my_videos_html():
                     <video src="${videoUrl}" controls style="max-width: 100%; max-height: 100%;"></video>
                 </body>
                 </html>
-            `);
+            `], { type: 'text/html' });
+            const url = URL.createObjectURL(blob);
+            window.open(url, '_blank');
+            // 新窗口加载完成后即可释放 Blob URL
+            setTimeout(() => URL.revokeObjectURL(url), 60000);
         }
 
         // 新增：在线播放功能
@@ -1385,9 +1400,8 @@ def my_videos_html():
             }
 
             // 简单校验
-            const allowed = ['mp4', 'avi', 'mov', 'mkv'];
             const ext = new_filename.split('.').pop().toLowerCase();
-            if (!allowed.includes(ext)) {
+            if (!ALLOWED_EXTS.has(ext)) {
                 alert('不允许的文件类型！');
                 return;
             }
@@ -1735,6 +1749,45 @@ def search_html():
     </html>
     """
 
+# =========================
+# 预构建页面响应
+# =========================
+
+def _build_page(html):
+    """
+    填入页面中的占位符并编码为字节
+    """
+    # 前端的扩展名校验与后端共用 ALLOWED_EXTENSIONS
+    return html.replace('__ALLOWED_EXTS__', json.dumps(sorted(ALLOWED_EXTENSIONS))).encode('utf-8')
+
+# 页面内容是常量，导入时只编码一次；每个请求仅用缓存的字节构造一个轻量 Response，
+# 不直接复用同一个 Response 实例，因为 CORS 等 after_request 钩子会修改响应头。
+_PAGE_BYTES = {
+    'index': _build_page(index_html()),
+    'register': _build_page(register_html()),
+    'login': _build_page(login_html()),
+    'upload': _build_page(upload_html()),
+    'my_videos': _build_page(my_videos_html()),
+    'search': _build_page(search_html()),
+}
+
+# 页面首屏依赖 CDN 上的 Bootstrap 样式；通过 Link 预加载头提示浏览器尽早下载，
+# 支持 103 Early Hints 的反向代理（nginx 1.25+、Cloudflare）会提前转发该提示
+BOOTSTRAP_PRELOAD_LINK = (
+    '<https://cdn.jsdelivr.net/npm/bootswatch@5.3.0/dist/minty/bootstrap.min.css>; '
+    'rel=preload; as=style; crossorigin'
+)
+
+def _page_response(name):
+    """
+    用预编码的页面字节返回 HTML 响应，并附带样式预加载提示
+    """
+    return Response(
+        _PAGE_BYTES[name],
+        mimetype='text/html; charset=utf-8',
+        headers={'Link': BOOTSTRAP_PRELOAD_LINK}
+    )
+
 # =========================
 # 运行应用
 # =========================
@@ -1,6 +1,24 @@
 import os
+import hmac
+import hashlib
+import json
+import shutil
+import tarfile
+import mimetypes
+from urllib.parse import quote
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, jsonify, send_from_directory, abort, Response
 from flask_httpauth import HTTPBasicAuth
+from werkzeug.exceptions import HTTPException
+
+# orjson encodes straight to bytes and is much faster for large listings
+try:
+    import orjson
+    hasOrjson = True
+except ImportError:
+    hasOrjson = False
 
 app = Flask(__name__)
 auth = HTTPBasicAuth()
@@ -14,46 +32,72 @@ USER_CREDENTIALS = {
     "user": "passwd456"
 }
 
+# SHA-256 digests of the passwords, computed once so every check compares
+# fixed-length values in constant time
+USER_PASSWORD_DIGESTS = {
+    name: hashlib.sha256(pw.encode("utf-8")).digest()
+    for name, pw in USER_CREDENTIALS.items()
+}
+# Compared against for unknown users so they take the same path
+UNKNOWN_USER_DIGEST = bytes(32)
+
 @auth.verify_password
 def verify_password(username, password):
     """
     Verify username and password for HTTP Basic Auth.
     Returns the username if valid, else None.
     """
-    if username in USER_CREDENTIALS and USER_CREDENTIALS[username] == password:
+    expected = USER_PASSWORD_DIGESTS.get(username, UNKNOWN_USER_DIGEST)
+    supplied = hashlib.sha256(password.encode("utf-8")).digest()
+    if hmac.compare_digest(supplied, expected) and username in USER_PASSWORD_DIGESTS:
         return username
 
 # Directory where files and folders are stored
-STORAGE_ROOT = os.path.abspath("storage")
+STORAGE_ROOT = os.path.realpath("storage")
 os.makedirs(STORAGE_ROOT, exist_ok=True)
 
-def secure_path(relative_path=""):
+# When served behind nginx, set this to an `internal` location aliased to
+# STORAGE_ROOT (e.g. "/protected/") so downloads are sent by nginx via
+# X-Accel-Redirect instead of streaming through Python:
+#   location /protected/ { internal; alias /abs/path/to/storage/; }
+ACCEL_REDIRECT_PREFIX = os.environ.get("ACCEL_REDIRECT_PREFIX", "")
+
+def secure_path(relative_path="", follow_symlinks=True):
     """
     Resolve and sanitize a relative path under STORAGE_ROOT.
     Prevents directory traversal attacks.
+    With follow_symlinks=False only the parent directory is resolved, so a
+    symlink named by the path is returned as the link itself, not its target.
     """
-    absolute = os.path.normpath(os.path.join(STORAGE_ROOT, relative_path))
-    if not absolute.startswith(STORAGE_ROOT):
+    if follow_symlinks:
+        absolute = os.path.realpath(os.path.join(STORAGE_ROOT, relative_path))
+        checked = absolute
+    else:
+        joined = os.path.normpath(os.path.join(STORAGE_ROOT, relative_path))
+        if joined == STORAGE_ROOT:
+            return STORAGE_ROOT
+        checked = os.path.realpath(os.path.dirname(joined))
+        absolute = os.path.join(checked, os.path.basename(joined))
+    # commonpath compares whole components, so a sibling like "storage2" is rejected
+    if os.path.commonpath((checked, STORAGE_ROOT)) != STORAGE_ROOT:
         abort(400, "Invalid path")
     return absolute
 
 # ----------------------------------------
 # Main Page (Frontend + Embedded JS/CSS)
 # ----------------------------------------
-@app.route("/")
-@auth.login_required
-def home():
-    """
-    Serve the single-page file manager application.
-    Embeds HTML, CSS, and JavaScript in one response.
-    """
-    html = """
+# Single-page file manager application (HTML, CSS and JavaScript in one document).
+# Built and encoded once at import; the page is the same for every request.
+HOME_HTML = """
 <!DOCTYPE html>
 <html lang="zh">
 <head>
   <meta charset="UTF-8">
   <title>Flask File Manager</title>
+  <link rel="preconnect" href="https://cdn.jsdelivr.net">
   <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+  <!-- Bootstrap Icons (for toolbar icons) -->
+  <link href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/bootstrap-icons.css" rel="stylesheet">
   <style>
     :root {
       --bg-light-green: #eafaf1;
@@ -87,6 +131,7 @@ def home():
     #fileTree li:hover {
       background-color: var(--btn-hover);
     }
+    #fileTree li.selected { background-color: #cfe2ff; }
     .folder::before { content: "📁 "; }
     .file::before   { content: "📄 "; }
     #contextMenu {
@@ -136,14 +181,20 @@ def home():
     <button data-action="move">移动</button>
   </div>
 
-  <!-- Bootstrap Icons (for toolbar icons) -->
-  <script src="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/bootstrap-icons.js"></script>
   <script>
     // ----------------------------------------
     // Frontend Logic (JavaScript)
     // ----------------------------------------
     let currentPath = "";
     let contextItem = null;
+    // Ctrl/Cmd-click multi-selection (full relative paths, dirs end with "/")
+    const selected = new Set();
+
+    // Short-lived listing cache: path -> {entries, ts}
+    const dirCache = new Map();
+    const DIR_CACHE_TTL = 5000;
+    // Pending listing requests: path -> Promise
+    const inFlight = new Map();
 
     // Element bindings
     document.getElementById("btnUp").onclick        = navigateUp;
@@ -161,18 +212,70 @@ def home():
       document.body.classList.toggle('theme-red', color === 'red');
     }
 
+    // Normalize a relative path into a cache key ("" or "a/b/")
+    function dirKey(path) {
+      const parts = path.split("/").filter(Boolean);
+      return parts.length ? parts.join("/") + "/" : "";
+    }
+
+    // Drop cached listings for a directory and everything below it
+    function invalidateDir(path) {
+      const key = dirKey(path);
+      for (const k of dirCache.keys()) {
+        if (k.startsWith(key)) dirCache.delete(k);
+      }
+      for (const k of inFlight.keys()) {
+        if (k.startsWith(key)) inFlight.delete(k);
+      }
+    }
+
     // Fetch directory listing from backend
+    // Fresh cache hits render without a request; stale hits render and revalidate.
     function fetchDirectory() {
-      fetch(`/api/list?path=${encodeURIComponent(currentPath)}`)
-        .then(res => res.json())
-        .then(renderFileTree);
-      document.getElementById("pathDisplay").textContent = "/" + currentPath;
+      const path = currentPath;
+      const key = dirKey(path);
+      document.getElementById("pathDisplay").textContent = "/" + path;
+      const cached = dirCache.get(key);
+      if (cached) {
+        renderFileTree(cached.entries);
+        if (Date.now() - cached.ts < DIR_CACHE_TTL) return;
+      }
+      requestListing(key, path).then(entries => {
+        if (path === currentPath) renderFileTree(entries);
+      });
+    }
+
+    // Share one in-flight /api/list request per directory.
+    // Invalidation drops the entry, so a superseded response is not cached.
+    function requestListing(key, path) {
+      let pending = inFlight.get(key);
+      if (!pending) {
+        pending = fetch(`/api/list?path=${encodeURIComponent(path)}`)
+          .then(res => res.json())
+          .then(entries => {
+            if (inFlight.get(key) === pending) dirCache.set(key, {entries, ts: Date.now()});
+            return entries;
+          })
+          .finally(() => {
+            if (inFlight.get(key) === pending) inFlight.delete(key);
+          });
+        inFlight.set(key, pending);
+      }
+      return pending;
+    }
+
+    // Refresh after mutations; back-to-back calls within 50ms collapse into one listing
+    let refreshTimer = null;
+    function scheduleRefresh() {
+      clearTimeout(refreshTimer);
+      refreshTimer = setTimeout(fetchDirectory, 50);
     }
 
     // Render file/folder list as nested UL
     function renderFileTree(items) {
       const container = document.getElementById("fileTree");
-      container.innerHTML = "";
+      selected.clear();
+      // Items are built into a detached <ul>; the live tree is swapped in one step
       const ul = document.createElement("ul");
 
       items.forEach(item => {
@@ -181,9 +284,16 @@ def home():
         li.className = item.is_dir ? "folder" : "file";
         li.draggable = true;
 
-        // Click to navigate or download
+        // Click to navigate or download; Ctrl/Cmd-click toggles selection
         li.onclick = e => {
           e.stopPropagation();
+          if (e.ctrlKey || e.metaKey) {
+            const path = currentPath + item.name + (item.is_dir ? "/" : "");
+            if (selected.has(path)) selected.delete(path);
+            else selected.add(path);
+            li.classList.toggle("selected", selected.has(path));
+            return;
+          }
           if (item.is_dir) {
             currentPath += item.name + "/";
             fetchDirectory();
@@ -214,7 +324,7 @@ def home():
         ul.appendChild(li);
       });
 
-      container.appendChild(ul);
+      container.replaceChildren(ul);
     }
 
     // Show custom context menu at x,y
@@ -238,7 +348,7 @@ def home():
       const isDir = contextItem.is_dir;
       const fullPath = currentPath + name + (isDir ? "/" : "");
       hideContextMenu();
-      if (action === "delete")   deleteEntry(fullPath);
+      if (action === "delete")   deleteEntries(selected.has(fullPath) ? [...selected] : [fullPath]);
       if (action === "rename")   renameEntry(fullPath);
       if (action === "move")     moveEntry(fullPath);
     }
@@ -258,37 +368,130 @@ def home():
         method: "POST",
         headers: {"Content-Type":"application/json"},
         body: JSON.stringify({path: currentPath, name: folderName})
-      }).then(fetchDirectory);
+      }).then(() => { invalidateDir(currentPath); scheduleRefresh(); });
+    }
+
+    // Above this many files, upload one tar stream instead of a multipart form
+    const ARCHIVE_UPLOAD_THRESHOLD = 20;
+    const utf8 = new TextEncoder();
+
+    // Build an uncompressed ustar archive; file contents stay as Blob parts
+    function buildTar(files) {
+      const parts = [];
+      files.forEach(f => {
+        const header = new Uint8Array(512);
+        const put = (str, offset) => header.set(utf8.encode(str), offset);
+        const octal = (num, width) => num.toString(8).padStart(width - 1, "0") + "\0";
+        put(f.name, 0);
+        put(octal(0o644, 8), 100);
+        put(octal(0, 8), 108);
+        put(octal(0, 8), 116);
+        put(octal(f.size, 12), 124);
+        put(octal(Math.floor(f.lastModified / 1000), 12), 136);
+        put("        ", 148);
+        put("0", 156);
+        put("ustar\0" + "00", 257);
+        const checksum = header.reduce((a, b) => a + b, 0);
+        put(checksum.toString(8).padStart(6, "0") + "\0 ", 148);
+        parts.push(header, f);
+        const padding = (512 - f.size % 512) % 512;
+        if (padding) parts.push(new Uint8Array(padding));
+      });
+      parts.push(new Uint8Array(1024));
+      return new Blob(parts, {type: "application/x-tar"});
+    }
+
+    // Run fn over items with at most `limit` promises pending at once
+    async function pool(items, limit, fn) {
+      const pending = new Set();
+      const results = [];
+      for (const item of items) {
+        const p = fn(item).finally(() => pending.delete(p));
+        pending.add(p);
+        results.push(p);
+        if (pending.size >= limit) await Promise.race(pending);
+      }
+      return Promise.all(results);
     }
 
+    const UPLOAD_CONCURRENCY = 3;
+
     // Upload selected files
     function uploadFiles() {
       const input = document.getElementById("fileInput");
-      const form = new FormData();
-      Array.from(input.files).forEach(f => form.append("files", f));
-      form.append("path", currentPath);
-      fetch("/api/upload", {method:"POST", body: form})
-        .then(() => { input.value=""; fetchDirectory(); });
+      const files = Array.from(input.files);
+      let request;
+      // ustar names are limited to 100 bytes; longer names use the form upload
+      if (files.length > ARCHIVE_UPLOAD_THRESHOLD &&
+          files.every(f => utf8.encode(f.name).length <= 100)) {
+        request = fetch(`/api/upload_archive?path=${encodeURIComponent(currentPath)}`, {
+          method:"POST",
+          headers: {"Content-Type":"application/x-tar"},
+          body: buildTar(files)
+        });
+      } else {
+        // One request per file, at most UPLOAD_CONCURRENCY at a time so listings
+        // and other calls still get a browser connection
+        const path = currentPath;
+        request = pool(files, UPLOAD_CONCURRENCY, f => {
+          const form = new FormData();
+          form.append("files", f);
+          form.append("path", path);
+          return fetch("/api/upload", {method:"POST", body: form});
+        });
+      }
+      request.then(() => { input.value=""; invalidateDir(currentPath); scheduleRefresh(); });
     }
 
-    // Delete a file or folder
-    function deleteEntry(path) {
-      fetch("/api/delete", {
+    // Parent directory of a relative path, as a cache key
+    function parentDir(path) {
+      const parts = dirKey(path).split("/").filter(Boolean);
+      return dirKey(parts.slice(0, -1).join("/"));
+    }
+
+    // Pending mutations, coalesced into a single /api/batch request
+    let pendingOps = [];
+    let batchTimer = null;
+
+    function queueOp(op) {
+      pendingOps.push(op);
+      if (!batchTimer) batchTimer = setTimeout(flushOps, 25);
+    }
+
+    function flushOps() {
+      const ops = pendingOps;
+      pendingOps = [];
+      batchTimer = null;
+      fetch("/api/batch", {
         method:"POST",
         headers: {"Content-Type":"application/json"},
-        body: JSON.stringify({path})
-      }).then(fetchDirectory);
+        body: JSON.stringify({ops})
+      }).then(() => {
+        ops.forEach(op => {
+          if (op.op === "move") {
+            invalidateDir(parentDir(op.src));
+            invalidateDir(op.dst);
+          } else {
+            invalidateDir(parentDir(op.path));
+          }
+        });
+        scheduleRefresh();
+      });
+    }
+
+    // Delete a file or folder
+    // Folders are removed with their contents after one confirmation
+    function deleteEntries(paths) {
+      const dirs = paths.filter(p => p.endsWith("/"));
+      if (dirs.length && !confirm(`删除 ${dirs.length} 个文件夹及其全部内容？`)) return;
+      paths.forEach(path => queueOp({op: "delete", path, recursive: path.endsWith("/")}));
     }
 
     // Rename a file or folder
     function renameEntry(path) {
       const newName = prompt("新名称：", path.split("/").pop());
       if (!newName) return;
-      fetch("/api/rename", {
-        method:"POST",
-        headers: {"Content-Type":"application/json"},
-        body: JSON.stringify({path, new_name: newName})
-      }).then(fetchDirectory);
+      queueOp({op: "rename", path, new_name: newName});
     }
 
     // Move a file or folder via prompt
@@ -300,40 +503,134 @@ def home():
 
     // Send move request to backend
     function sendMoveRequest(src, dst) {
-      fetch("/api/move", {
-        method:"POST",
-        headers: {"Content-Type":"application/json"},
-        body: JSON.stringify({src, dst})
-      }).then(fetchDirectory);
+      queueOp({op: "move", src, dst});
     }
 
     window.onload = fetchDirectory;
   </script>
 </body>
 </html>
+"""
+HOME_HTML_BYTES = HOME_HTML.encode("utf-8")
+
+@app.route("/")
+@auth.login_required
+def home():
     """
-    return Response(html, mimetype="text/html")
+    Serve the single-page file manager application.
+    Embeds HTML, CSS, and JavaScript in one response.
+    """
+    return Response(HOME_HTML_BYTES, mimetype="text/html; charset=utf-8",
+                    headers={"Cache-Control": "private, max-age=300",
+                             "Link": "<https://cdn.jsdelivr.net>; rel=preconnect"})
 
 # ----------------------------------------
 # API Endpoints (File Operations)
 # ----------------------------------------
 
+# Bounded pool for recursive listings; also caps the number of open directory handles
+LISTING_POOL = ThreadPoolExecutor(max_workers=8)
+MAX_LIST_DEPTH = 16
+
+def scan_directory(path):
+    """
+    List the immediate entries of a directory.
+    """
+    # scandir reuses the dirent type from readdir, so no per-entry stat is needed
+    with os.scandir(path) as it:
+        return [{"name": e.name, "is_dir": e.is_dir(follow_symlinks=False)} for e in it]
+
+def scan_tree(path, depth):
+    """
+    List a directory and, while depth > 0, attach subdirectory listings as "children".
+    """
+    entries = scan_directory(path)
+    if depth > 0:
+        for entry in entries:
+            if entry["is_dir"]:
+                entry["children"] = scan_tree(os.path.join(path, entry["name"]), depth - 1)
+    return entries
+
+def scan_tree_parallel(root, depth):
+    """
+    Like scan_tree, but scan each immediate subdirectory on LISTING_POOL.
+    """
+    entries = scan_directory(root)
+    subdirs = [e for e in entries if e["is_dir"]]
+    if depth > 0 and subdirs:
+        subtrees = LISTING_POOL.map(
+            lambda e: scan_tree(os.path.join(root, e["name"]), depth - 1), subdirs)
+        for entry, children in zip(subdirs, subtrees):
+            entry["children"] = children
+    return entries
+
+def dump_json(obj):
+    """
+    Serialize obj to compact UTF-8 JSON bytes, using orjson when available.
+    """
+    if hasOrjson:
+        try:
+            return orjson.dumps(obj)
+        except orjson.JSONEncodeError:
+            # Non-UTF-8 filenames arrive from scandir with surrogate escapes,
+            # which orjson rejects; the ASCII-escaped encoder below accepts them
+            pass
+    return json.dumps(obj, separators=(",", ":")).encode("ascii")
+
+# path -> (mtime_ns, JSON bytes), least recently used first
+LISTING_CACHE = OrderedDict()
+LISTING_CACHE_SIZE = 1024
+listing_cache_lock = threading.Lock()
+
+def cached_listing(path, mtime_ns):
+    """
+    Serialized JSON listing of a directory. Each path keeps only the payload
+    for its latest mtime, so a changed directory replaces its old entry.
+    """
+    with listing_cache_lock:
+        hit = LISTING_CACHE.get(path)
+        if hit is not None and hit[0] == mtime_ns:
+            LISTING_CACHE.move_to_end(path)
+            return hit[1]
+    body = dump_json(scan_directory(path))
+    with listing_cache_lock:
+        LISTING_CACHE[path] = (mtime_ns, body)
+        LISTING_CACHE.move_to_end(path)
+        if len(LISTING_CACHE) > LISTING_CACHE_SIZE:
+            LISTING_CACHE.popitem(last=False)
+    return body
+
 @app.route("/api/list", methods=["GET"])
 @auth.login_required
 def list_directory():
     """
     Return JSON list of entries (files/directories) for a given path.
+    With recursive=1, subdirectories up to `depth` levels (default 1) are
+    included under a "children" key.
     """
     rel = request.args.get("path", "")
     root = secure_path(rel)
-    entries = []
-    for name in os.listdir(root):
-        path = os.path.join(root, name)
-        entries.append({"name": name, "is_dir": os.path.isdir(path)})
-    return jsonify(entries)
+    if request.args.get("recursive") == "1":
+        # A directory's mtime does not cover its subtree, so no ETag here
+        depth = min(request.args.get("depth", 1, type=int), MAX_LIST_DEPTH)
+        return Response(dump_json(scan_tree_parallel(root, depth)), mimetype="application/json")
+    # The directory mtime changes whenever an entry is added, removed or renamed,
+    # so it doubles as a validator for the listing.
+    mtime_ns = os.stat(root).st_mtime_ns
+    etag = f"{mtime_ns:x}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(cached_listing(root, mtime_ns), mimetype="application/json")
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 # ----------------------------------------
 
+# Copy buffer for uploads; far fewer read/write calls than FileStorage.save()'s default
+UPLOAD_BUFFER_SIZE = 1024 * 1024
+
 @app.route("/api/upload", methods=["POST"])
 @auth.login_required
 def upload_files():
@@ -343,7 +640,36 @@ def upload_files():
     rel = request.form.get("path", "")
     dest = secure_path(rel)
     for f in request.files.getlist("files"):
-        f.save(os.path.join(dest, f.filename))
+        # Keep only the final path component (Unicode names are preserved)
+        name = os.path.basename(f.filename.replace("\\", "/"))
+        if name in ("", ".", ".."):
+            continue
+        with open(os.path.join(dest, name), "wb") as out:
+            shutil.copyfileobj(f.stream, out, UPLOAD_BUFFER_SIZE)
+    return jsonify(success=True)
+
+# ----------------------------------------
+
+@app.route("/api/upload_archive", methods=["POST"])
+@auth.login_required
+def upload_archive():
+    """
+    Extract a streamed tar archive (optionally compressed) into the specified
+    directory. Only regular files and directories are written.
+    """
+    rel = request.args.get("path", "")
+    secure_path(rel)
+    # Stream mode ("r|*") reads the request body sequentially, no temp file
+    with tarfile.open(fileobj=request.stream, mode="r|*") as archive:
+        for member in archive:
+            # secure_path rejects absolute names and ".." escapes
+            target = secure_path(os.path.join(rel, member.name))
+            if member.isdir():
+                os.makedirs(target, exist_ok=True)
+            elif member.isfile():
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.extractfile(member) as src, open(target, "wb") as out:
+                    shutil.copyfileobj(src, out, UPLOAD_BUFFER_SIZE)
     return jsonify(success=True)
 
 # ----------------------------------------
@@ -358,6 +684,13 @@ def download_file():
     full = secure_path(rel)
     if os.path.isdir(full):
         abort(400, "Cannot download a directory")
+    if ACCEL_REDIRECT_PREFIX:
+        name = os.path.basename(full)
+        target = os.path.relpath(full, STORAGE_ROOT).replace(os.sep, "/")
+        response = Response(mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream")
+        response.headers["X-Accel-Redirect"] = ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(target)
+        response.headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(name)}"
+        return response
     return send_from_directory(STORAGE_ROOT, rel, as_attachment=True)
 
 # ----------------------------------------
@@ -366,15 +699,26 @@ def download_file():
 @auth.login_required
 def delete_entry():
     """
-    Delete a file or empty directory.
+    Delete a file or directory; pass "recursive": true to delete a non-empty directory.
     """
-    rel = request.json.get("path")
-    full = secure_path(rel)
-    if os.path.isdir(full):
-        os.rmdir(full)
+    remove_entry(request.json.get("path"), request.json.get("recursive", False))
+    return jsonify(success=True)
+
+def remove_entry(rel, recursive=False):
+    """
+    Remove the file or directory at a relative path.
+    Directories must be empty unless recursive is true.
+    """
+    full = secure_path(rel, follow_symlinks=False)
+    if full == STORAGE_ROOT:
+        abort(400, "Cannot delete the storage root")
+    # A symlink is removed as a link, never by descending into its target
+    if os.path.islink(full):
+        os.unlink(full)
+    elif os.path.isdir(full):
+        (shutil.rmtree if recursive else os.rmdir)(full)
     else:
         os.remove(full)
-    return jsonify(success=True)
 
 # ----------------------------------------
 
@@ -384,13 +728,21 @@ def rename_entry():
     """
     Rename a file or directory.
     """
-    rel = request.json.get("path")
-    new_name = request.json.get("new_name")
-    src = secure_path(rel)
-    dst = os.path.join(os.path.dirname(src), new_name)
-    os.rename(src, dst)
+    rename_path(request.json.get("path"), request.json.get("new_name"))
     return jsonify(success=True)
 
+def rename_path(rel, new_name):
+    """
+    Rename the entry at a relative path within its parent directory.
+    """
+    # A plain name cannot leave the parent directory, so no second secure_path
+    if not new_name or "/" in new_name or os.sep in new_name or new_name in (".", ".."):
+        abort(400, "Invalid name")
+    src = secure_path(rel, follow_symlinks=False)
+    if src == STORAGE_ROOT:
+        abort(400, "Cannot rename the storage root")
+    os.replace(src, os.path.join(os.path.dirname(src), new_name))
+
 # ----------------------------------------
 
 @app.route("/api/mkdir", methods=["POST"])
@@ -399,11 +751,15 @@ def make_directory():
     """
     Create a new directory under the specified path.
     """
-    rel = request.json.get("path", "")
-    name = request.json.get("name")
+    create_directory(request.json.get("path", ""), request.json.get("name"))
+    return jsonify(success=True)
+
+def create_directory(rel, name):
+    """
+    Create a named directory under a relative path.
+    """
     target = os.path.join(secure_path(rel), name)
     os.makedirs(target, exist_ok=True)
-    return jsonify(success=True)
 
 # ----------------------------------------
 
@@ -413,13 +769,60 @@ def move_entry():
     """
     Move (or rename) a file or directory to a new location.
     """
-    src = secure_path(request.json.get("src"))
-    dst = secure_path(request.json.get("dst"))
-    os.rename(src, os.path.join(dst, os.path.basename(src)))
+    move_path(request.json.get("src"), request.json.get("dst"))
     return jsonify(success=True)
 
+def move_path(src_rel, dst_rel):
+    """
+    Move the entry at src_rel into the directory dst_rel.
+    """
+    src = secure_path(src_rel, follow_symlinks=False)
+    if src == STORAGE_ROOT:
+        abort(400, "Cannot move the storage root")
+    dst = secure_path(dst_rel)
+    os.rename(src, os.path.join(dst, os.path.basename(src)))
+
+# ----------------------------------------
+
+# Operation name -> handler taking the op dict
+BATCH_OPERATIONS = {
+    "delete": lambda op: remove_entry(op.get("path"), op.get("recursive", False)),
+    "rename": lambda op: rename_path(op.get("path"), op.get("new_name")),
+    "mkdir":  lambda op: create_directory(op.get("path", ""), op.get("name")),
+    "move":   lambda op: move_path(op.get("src"), op.get("dst")),
+}
+
+@app.route("/api/batch", methods=["POST"])
+@auth.login_required
+def batch_operations():
+    """
+    Apply a list of delete/rename/mkdir/move operations in one request.
+    Body: {"ops": [{"op": "delete", "path": ...}, {"op": "move", "src": ..., "dst": ...}, ...]}
+    Returns a per-operation status list; one failure does not stop the rest.
+    A malformed body (not an object holding a list of objects) is rejected with 400.
+    """
+    body = request.get_json(silent=True)
+    ops = body.get("ops", []) if isinstance(body, dict) else None
+    if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+        abort(400, 'Body must be {"ops": [operation objects]}')
+    results = []
+    for index, op in enumerate(ops):
+        try:
+            handler = BATCH_OPERATIONS.get(op.get("op"))
+            if handler is None:
+                raise ValueError(f"Unknown operation: {op.get('op')}")
+            handler(op)
+            results.append({"index": index, "ok": True})
+        except (HTTPException, OSError, TypeError, ValueError) as e:
+            results.append({"index": index, "ok": False, "error": str(e)})
+    return jsonify(results=results)
+
 # ----------------------------------------
 # Application Runner
 # ----------------------------------------
+# The development server below handles each request in its own thread.
+# For deployment, run under gunicorn with gevent workers so long downloads
+# and uploads do not hold up listings and other API calls:
+#   gunicorn -k gevent -w 4 -b 0.0.0.0:5000 "私人用的云文件管理:app"
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
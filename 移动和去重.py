@@ -1,19 +1,225 @@
 import os
+import errno
 import shutil
 import hashlib
+import mmap
 import threading
 import queue
+import time
+import sqlite3
+from functools import partial
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
+# 优先使用 BLAKE3（比 MD5 快得多），未安装时回退到 MD5
+try:
+    from blake3 import blake3
+    hasBlake3 = True
+except ImportError:
+    hasBlake3 = False
+
+HASH_ALGORITHM = "blake3" if hasBlake3 else "md5"
+
+def new_hasher():
+    return blake3() if hasBlake3 else hashlib.md5()
+
+# 大块读取减少系统调用次数；缓冲区在每个进程内复用，避免每块分配新的 bytes
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+_hash_buffer = None
+# 不小于该大小的文件使用 mmap 计算哈希
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+# 按存储介质选择块大小：机械硬盘用大块减少寻道，固态盘较小的块即可跑满带宽
+ROTATIONAL_CHUNK_SIZE = 4 * 1024 * 1024
+SOLID_STATE_CHUNK_SIZE = 256 * 1024
+UNKNOWN_CHUNK_SIZE = 1024 * 1024
+_device_chunk_sizes = {}
+
+def _is_rotational(dev):
+    # Linux 下通过 /sys/dev/block/<主:次>/queue/rotational 判断；分区本身没有 queue，取其所在磁盘的
+    # 无法判断（非 Linux、网络文件系统等）时返回 None
+    sys_path = os.path.realpath(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}")
+    for base in (sys_path, os.path.dirname(sys_path)):
+        try:
+            with open(os.path.join(base, "queue", "rotational")) as f:
+                return f.read().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+def choose_chunk_size(path):
+    # 结果按设备号缓存，同一块盘只探测一次
+    try:
+        dev = os.stat(path).st_dev
+    except OSError:
+        return UNKNOWN_CHUNK_SIZE
+    if dev not in _device_chunk_sizes:
+        rotational = _is_rotational(dev) if hasattr(os, "major") else None
+        if rotational is None:
+            _device_chunk_sizes[dev] = UNKNOWN_CHUNK_SIZE
+        else:
+            _device_chunk_sizes[dev] = ROTATIONAL_CHUNK_SIZE if rotational else SOLID_STATE_CHUNK_SIZE
+    return _device_chunk_sizes[dev]
+
+def fadvise(fd, advice_name):
+    # posix_fadvise 仅在 Unix 上可用，其它平台直接忽略
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, getattr(os, advice_name))
+        except OSError:
+            pass
+
+def _get_hash_buffer(chunk_size):
+    global _hash_buffer
+    if _hash_buffer is None or len(_hash_buffer) != chunk_size:
+        _hash_buffer = bytearray(chunk_size)
+    return memoryview(_hash_buffer)
+
+# 在子进程中执行，因此定义为模块级函数（不能引用线程对象）
+def compute_file_hash(file_path, chunk_size=HASH_CHUNK_SIZE):
+    view = _get_hash_buffer(chunk_size)
+    hasher = new_hasher()
+    with open(file_path, "rb", buffering=0) as file:
+        # 顺序读取提示加大预读；读完后丢弃页缓存，避免一次性扫描挤掉常用数据
+        fadvise(file.fileno(), "POSIX_FADV_SEQUENTIAL")
+        try:
+            return _hash_open_file(file, hasher, view, chunk_size)
+        finally:
+            fadvise(file.fileno(), "POSIX_FADV_DONTNEED")
+
+def _hash_open_file(file, hasher, view, chunk_size):
+    if os.fstat(file.fileno()).st_size >= MMAP_THRESHOLD:
+        # 大文件直接映射页缓存，省去一次内核到用户空间的拷贝
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mm) as mapped:
+                for offset in range(0, len(mapped), chunk_size):
+                    hasher.update(mapped[offset:offset + chunk_size])
+        return hasher.hexdigest()
+    while True:
+        n = file.readinto(view)
+        if not n:
+            break
+        hasher.update(view[:n])
+    return hasher.hexdigest()
+
+def _sendfile_copy(src_fd, dest_fd, size):
+    # 由内核直接在两个文件之间复制，不经过用户空间缓冲区；不支持时返回 False
+    if not hasattr(os, "sendfile"):
+        return False
+    offset = 0
+    try:
+        while offset < size:
+            sent = os.sendfile(dest_fd, src_fd, offset, min(size - offset, 1 << 30))
+            if sent == 0:
+                break
+            offset += sent
+    except OSError:
+        # 第一次调用就失败说明平台不支持文件到文件的 sendfile（如 macOS），回退到普通复制
+        if offset == 0:
+            return False
+        raise
+    return True
+
+def copy_file(src_path, dest_path, keep_metadata=True):
+    # 对源文件给出顺序读取提示，复制后释放其页缓存；keep_metadata 为 True 时与 shutil.copy2 等价
+    with open(src_path, "rb") as fsrc, open(dest_path, "wb") as fdst:
+        fadvise(fsrc.fileno(), "POSIX_FADV_SEQUENTIAL")
+        size = os.fstat(fsrc.fileno()).st_size
+        if not _sendfile_copy(fsrc.fileno(), fdst.fileno(), size):
+            shutil.copyfileobj(fsrc, fdst, HASH_CHUNK_SIZE)
+        fadvise(fsrc.fileno(), "POSIX_FADV_DONTNEED")
+    if keep_metadata:
+        shutil.copystat(src_path, dest_path)
+
+def copy_and_hash(src_path, dest_path, keep_metadata=True, chunk_size=HASH_CHUNK_SIZE):
+    # 复制的同时计算内容哈希并返回，后续去重直接复用，源文件只需读取一遍
+    view = _get_hash_buffer(chunk_size)
+    hasher = new_hasher()
+    with open(src_path, "rb", buffering=0) as fsrc, open(dest_path, "wb") as fdst:
+        fadvise(fsrc.fileno(), "POSIX_FADV_SEQUENTIAL")
+        while True:
+            n = fsrc.readinto(view)
+            if not n:
+                break
+            hasher.update(view[:n])
+            fdst.write(view[:n])
+        fadvise(fsrc.fileno(), "POSIX_FADV_DONTNEED")
+    if keep_metadata:
+        shutil.copystat(src_path, dest_path)
+    return hasher.hexdigest()
+
+# 头部预筛只读取的字节数
+HEAD_HASH_SIZE = 64 * 1024
+
+def compute_head_hash(file_path, head_size=HEAD_HASH_SIZE):
+    hasher = new_hasher()
+    with open(file_path, "rb") as file:
+        hasher.update(file.read(head_size))
+    return hasher.hexdigest()
+
+# 哈希进程池大小，也就是同时在途的读请求数（I/O 队列深度）；
+# NVMe 固态盘可适当调大，机械硬盘建议 2~4 以免磁头来回寻道
+HASH_WORKERS = os.cpu_count() or 1
+
+# 持久化的哈希缓存：(路径, 大小, 修改时间, inode, ctime) 都未变化的文件直接复用上次的哈希
+HASH_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "move_dedup.sqlite")
+
+class HashCache:
+    def __init__(self, db_path=HASH_CACHE_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # 键里加入 inode 和 ctime：换了文件（哪怕大小、修改时间相同）或内容被改写都会失配
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hash_v2 ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, ino INTEGER, ctime_ns INTEGER, "
+            "algo TEXT, hash TEXT)"
+        )
+
+    def lookup(self, path, size, mtime_ns, ino, ctime_ns):
+        row = self.conn.execute(
+            "SELECT hash FROM file_hash_v2 WHERE path=? AND size=? AND mtime_ns=? AND ino=? AND ctime_ns=? AND algo=?",
+            (path, size, mtime_ns, ino, ctime_ns, HASH_ALGORITHM)
+        ).fetchone()
+        return row[0] if row else None
+
+    def store_many(self, rows):
+        # rows: [(path, size, mtime_ns, ino, ctime_ns, hash), ...]，在一个事务中写入
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO file_hash_v2 (path, size, mtime_ns, ino, ctime_ns, algo, hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(path, size, mtime_ns, ino, ctime_ns, HASH_ALGORITHM, file_hash)
+                 for path, size, mtime_ns, ino, ctime_ns, file_hash in rows]
+            )
+
+    def delete_many(self, paths):
+        # 文件被删除或由本次运行换入新文件后，其缓存行必须作废
+        with self.conn:
+            self.conn.executemany("DELETE FROM file_hash_v2 WHERE path=?", [(path,) for path in paths])
+
+    def close(self):
+        self.conn.close()
+
+# 工作线程发给界面的进度消息；kind 取值 tick / done / abort / error
+Progress = namedtuple("Progress", "kind cur total")
+# 进度更新的最短间隔（约 30 Hz）
+PROGRESS_INTERVAL = 1 / 30
+
 class WorkerThread(threading.Thread):
     def __init__(self, src_dirs, dest_dir, move_files, remove_duplicates, 
-                 log_queue, progress_queue, stop_event):
+                 log_queue, progress_queue, stop_event, keep_metadata=True):
         super().__init__()
         self.src_dirs = src_dirs
         self.dest_dir = dest_dir
         self.move_files = move_files
         self.remove_duplicates = remove_duplicates
+        self.keep_metadata = keep_metadata
         self.log_queue = log_queue
         self.progress_queue = progress_queue
         self.stop_event = stop_event
@@ -24,52 +230,231 @@ class WorkerThread(threading.Thread):
     def progress(self, message):
         self.progress_queue.put(message)
     
-    def ensure_unique_filename(self, target_directory, original_filename):
+    def ensure_unique_filename(self, existing_names, original_filename):
+        # existing_names 是目标目录中已有文件名的集合（统一 casefold，兼容不区分大小写的文件系统），
+        # 只查内存集合而不逐个 os.path.exists；选中的名字会加入集合
+        candidate_name = original_filename
+        if candidate_name.casefold() not in existing_names:
+            # 绝大多数文件名不冲突，直接返回，不必拆分扩展名
+            existing_names.add(candidate_name.casefold())
+            return candidate_name
         base_name, extension = os.path.splitext(original_filename)
         counter = 1
-        candidate_name = original_filename
-        while os.path.exists(os.path.join(target_directory, candidate_name)):
+        while candidate_name.casefold() in existing_names:
             candidate_name = f"{base_name}_{counter}{extension}"
             counter += 1
+        existing_names.add(candidate_name.casefold())
         return candidate_name
     
-    def compute_file_hash(self, file_path, chunk_size=8192):
-        hasher = hashlib.md5()
-        with open(file_path, "rb") as file:
-            for chunk in iter(lambda: file.read(chunk_size), b""):
-                if self.stop_event.is_set():
-                    raise Exception("操作已被用户中断")
-                hasher.update(chunk)
-        return hasher.hexdigest()
-    
-    def gather_files_by_extensions(self, source_directories, extensions_set):
+    def walk_one_directory(self, directory, ext_to_dir):
+        # 用栈代替 os.walk；scandir 的 is_dir/is_file 直接使用 readdir 返回的类型，无需额外 stat
         collected = []
-        for directory in source_directories:
+        stack = [directory]
+        while stack:
             if self.stop_event.is_set():
                 raise Exception("操作已被用户中断")
-            for root, _, file_names in os.walk(directory):
-                if self.stop_event.is_set():
-                    raise Exception("操作已被用户中断")
-                for name in file_names:
-                    if os.path.splitext(name)[1].lower() in extensions_set:
-                        full_path = os.path.join(root, name)
-                        collected.append(full_path)
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            name = entry.name
+                            dot = name.rfind(".")
+                            if dot > 0:
+                                target = ext_to_dir.get(name[dot:].lower())
+                                if target is not None:
+                                    collected.append((entry.path, target))
+            except OSError:
+                continue
         return collected
 
-    def run(self):
+    def gather_and_classify(self, source_directories, ext_to_dir):
+        # 一次遍历完成所有分类，返回 [(源文件路径, 目标分类目录), ...]
+        if self.stop_event.is_set():
+            raise Exception("操作已被用户中断")
+        if len(source_directories) < 2:
+            return [item for d in source_directories for item in self.walk_one_directory(d, ext_to_dir)]
+        # 多个源目录（可能位于不同磁盘）并行遍历；目录遍历是 I/O 操作，线程即可
+        with ThreadPoolExecutor(max_workers=min(8, len(source_directories))) as executor:
+            results = executor.map(lambda d: self.walk_one_directory(d, ext_to_dir), source_directories)
+            return [item for items in results for item in items]
+
+    def hash_in_pool(self, executor, hash_func, paths):
+        # 哈希计算在进程池中并行执行；返回 {路径: 哈希}，被用户中断时返回 None 并取消尚未开始的任务
+        futures = {executor.submit(hash_func, p): p for p in paths}
+        results = {}
         try:
-            self.log("任务启动...")
-            image_exts = {".jpg", ".jpeg", ".png", ".gif", ".bmp"}
-            video_exts = {".mp4", ".avi", ".mkv", ".mov"}
-            doc_exts = {".txt", ".md", ".doc", ".docx", ".pdf"}
+            for future in as_completed(futures):
+                if self.stop_event.is_set():
+                    return None
+                full_path = futures[future]
+                try:
+                    results[full_path] = future.result()
+                except Exception as e:
+                    self.log(f"[错误] 计算文件哈希失败: {full_path}，{e}")
+        finally:
+            for future in futures:
+                future.cancel()
+        return results
+
+    def find_duplicate_groups(self, check_dir, executor, hash_cache):
+        # 先按文件大小分组：大小不同的文件不可能重复，只有同大小的文件才需要计算哈希
+        size_to_paths = {}
+        file_stats = {}
+        # 循环内用局部变量代替 os.stat 属性查找；os.walk 给出的 root 已规范化，直接拼接即可
+        stat = os.stat
+        sep = os.sep
+        for root, _, files in os.walk(check_dir):
+            root_sep = root + sep
+            for f in files:
+                full_path = root_sep + f
+                try:
+                    st = stat(full_path)
+                except OSError as e:
+                    self.log(f"[错误] 读取文件大小失败: {full_path}，{e}")
+                    continue
+                file_stats[full_path] = (st.st_size, st.st_mtime_ns, st.st_ino, st.st_ctime_ns)
+                size_to_paths.setdefault(st.st_size, []).append(full_path)
+        # 空文件内容必然相同，无需打开读取
+        empty_files = size_to_paths.pop(0, [])
+        # 大小唯一的文件不可能有重复，直接跳过
+        candidates = [p for paths in size_to_paths.values() if len(paths) > 1 for p in paths]
+        path_to_hash = {}
+        head_candidates = []
+        full_candidates = []
+        for paths in size_to_paths.values():
+            if len(paths) < 2:
+                continue
+            uncached = []
+            for full_path in paths:
+                cached = hash_cache.lookup(full_path, *file_stats[full_path])
+                if cached is not None:
+                    path_to_hash[full_path] = cached
+                else:
+                    uncached.append(full_path)
+            # 组内已有缓存的完整哈希时无法用头部哈希预筛，直接计算完整哈希
+            if len(uncached) < len(paths):
+                full_candidates.extend(uncached)
+            else:
+                head_candidates.extend(uncached)
 
-            self.log("正在扫描源目录文件...")
-            images = self.gather_files_by_extensions(self.src_dirs, image_exts)
-            videos = self.gather_files_by_extensions(self.src_dirs, video_exts)
-            documents = self.gather_files_by_extensions(self.src_dirs, doc_exts)
+        new_rows = []
+        try:
+            # 第一阶段：只读取文件开头 HEAD_HASH_SIZE 字节，大小和头部哈希都相同的文件才进入第二阶段
+            head_hashes = self.hash_in_pool(executor, compute_head_hash, head_candidates)
+            if head_hashes is None:
+                return []
+            head_groups = {}
+            for full_path in head_candidates:
+                if full_path not in head_hashes:
+                    continue
+                size = file_stats[full_path][0]
+                if size <= HEAD_HASH_SIZE:
+                    # 头部已覆盖整个文件，头部哈希就是完整哈希
+                    path_to_hash[full_path] = head_hashes[full_path]
+                    new_rows.append((full_path, *file_stats[full_path], head_hashes[full_path]))
+                else:
+                    head_groups.setdefault((size, head_hashes[full_path]), []).append(full_path)
+            for paths in head_groups.values():
+                if len(paths) > 1:
+                    full_candidates.extend(paths)
+
+            # 第二阶段：完整内容哈希，块大小按分类目录所在设备选择
+            hash_func = partial(compute_file_hash, chunk_size=choose_chunk_size(check_dir))
+            full_hashes = self.hash_in_pool(executor, hash_func, full_candidates)
+            if full_hashes is None:
+                return []
+            for full_path, file_hash in full_hashes.items():
+                path_to_hash[full_path] = file_hash
+                new_rows.append((full_path, *file_stats[full_path], file_hash))
+        finally:
+            # 即使中途停止，已算出的哈希也写入缓存
+            hash_cache.store_many(new_rows)
+        # 按扫描顺序归组，保证保留的总是同一个文件
+        hash_to_paths = {}
+        for full_path in candidates:
+            if full_path in path_to_hash:
+                hash_to_paths.setdefault(path_to_hash[full_path], []).append(full_path)
+        groups = [dups for dups in hash_to_paths.values() if len(dups) > 1]
+        if len(empty_files) > 1:
+            groups.append(empty_files)
+        return groups
+
+    def unlink_files(self, paths, removed):
+        # 按所在目录打开一次目录描述符，再用 dir_fd 删除，省去每次的完整路径解析；
+        # 成功删除的路径追加到 removed，被用户中断时返回 False
+        use_dir_fd = os.unlink in os.supports_dir_fd
+        dir_fds = {}
+        try:
+            for path in paths:
+                if self.stop_event.is_set():
+                    return False
+                parent, name = os.path.split(path)
+                try:
+                    if use_dir_fd:
+                        if parent not in dir_fds:
+                            dir_fds[parent] = os.open(parent, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+                        os.unlink(name, dir_fd=dir_fds[parent])
+                    else:
+                        os.unlink(path)
+                    removed.append(path)
+                except OSError as e:
+                    self.log(f"[错误] 删除失败: {path}，{e}")
+        finally:
+            for fd in dir_fds.values():
+                os.close(fd)
+        return True
+
+    def remove_duplicate_files(self, category_dirs, copied_rows=(), placed_paths=()):
+        # copied_rows 为复制阶段顺带算出的哈希 [(路径, 大小, 修改时间, inode, ctime, 哈希), ...]，
+        # 先写入缓存供本次去重直接命中；placed_paths 是本次以重命名等方式放入、未经哈希的文件，
+        # 其旧缓存一律作废。返回 False 表示被用户中断
+        total_removed = 0
+        hash_cache = HashCache()
+        try:
+            hash_cache.delete_many(placed_paths)
+            hash_cache.store_many(copied_rows)
+            # 第一阶段只扫描：所有分类目录共用一个进程池，得到每个分类待删除的完整列表
+            to_delete = {}
+            with ProcessPoolExecutor(max_workers=HASH_WORKERS) as executor:
+                for check_dir in category_dirs:
+                    duplicate_groups = self.find_duplicate_groups(check_dir, executor, hash_cache)
+                    if self.stop_event.is_set():
+                        return False
+                    # 每组留第一个，删除其余
+                    to_delete[check_dir] = [dup_file for dups in duplicate_groups for dup_file in dups[1:]]
+            # 第二阶段统一删除，扫描与删除互不交错；每个分类只输出一条汇总日志
+            for check_dir, paths in to_delete.items():
+                removed = []
+                try:
+                    if not self.unlink_files(paths, removed):
+                        return False
+                finally:
+                    # 已删除文件的缓存行随即清除，以后同名的新文件不会命中旧哈希
+                    hash_cache.delete_many(removed)
+                total_removed += len(removed)
+                if paths:
+                    self.log(f"{os.path.basename(check_dir)}: 删除重复文件 {len(removed)} 个")
+        finally:
+            hash_cache.close()
+        self.log(f"重复文件删除完成，共删除 {total_removed} 个文件。")
+        return True
+
+    def copy_and_record(self, src_path, dest_path, copied_rows):
+        # 移动时也保留元数据，与 shutil.move 一致
+        file_hash = copy_and_hash(src_path, dest_path, self.keep_metadata or self.move_files,
+                                  choose_chunk_size(src_path))
+        st = os.stat(dest_path)
+        copied_rows.append((dest_path, st.st_size, st.st_mtime_ns, st.st_ino, st.st_ctime_ns, file_hash))
 
-            total_files = len(images) + len(videos) + len(documents)
-            self.log(f"共找到文件数量: 图片 {len(images)}，视频 {len(videos)}，文档 {len(documents)}，合计 {total_files}")
+    def run(self):
+        try:
+            self.log("任务启动...")
+            image_exts = frozenset({".jpg", ".jpeg", ".png", ".gif", ".bmp"})
+            video_exts = frozenset({".mp4", ".avi", ".mkv", ".mov"})
+            doc_exts = frozenset({".txt", ".md", ".doc", ".docx", ".pdf"})
 
             # 建立分类目录
             img_dir = os.path.join(self.dest_dir, "Images")
@@ -78,78 +463,119 @@ class WorkerThread(threading.Thread):
             for d in (img_dir, vid_dir, doc_dir):
                 os.makedirs(d, exist_ok=True)
 
-            all_files = (
-                [(path, img_dir) for path in images] +
-                [(path, vid_dir) for path in videos] +
-                [(path, doc_dir) for path in documents]
-            )
+            ext_to_dir = {}
+            for exts, category_dir in ((image_exts, img_dir), (video_exts, vid_dir), (doc_exts, doc_dir)):
+                for ext in exts:
+                    ext_to_dir[ext] = category_dir
+
+            self.log("正在扫描源目录文件...")
+            all_files = self.gather_and_classify(self.src_dirs, ext_to_dir)
+            counts = Counter(tgt_dir for _, tgt_dir in all_files)
+
+            total_files = len(all_files)
+            self.log(f"共找到文件数量: 图片 {counts[img_dir]}，视频 {counts[vid_dir]}，文档 {counts[doc_dir]}，合计 {total_files}")
 
             if total_files == 0:
                 self.log("未找到需要处理的文件，任务结束。")
-                self.progress("完成")
+                self.progress(Progress("done", 0, 0))
                 return
 
+            # 每个分类目录只扫描一次已有文件名
+            existing_names = {}
+            for d in (img_dir, vid_dir, doc_dir):
+                with os.scandir(d) as it:
+                    existing_names[d] = {entry.name.casefold() for entry in it}
+
+            # 移动时：源目录与目标在同一文件系统上则直接 os.rename（只改元数据），
+            # 否则交给 shutil.move 复制后删除；设备号按目录缓存
+            dest_dev = os.stat(self.dest_dir).st_dev
+            dir_devices = {}
+
+            # 需要去重时，跨设备复制改为边复制边计算哈希，去重阶段不再重新读取这些文件
+            copied_rows = []
+            # 其余方式（重命名、shutil.move、普通复制）放入的文件没有算过哈希，去重前作废其旧缓存
+            placed_paths = []
+
             self.log(f"开始{'移动' if self.move_files else '复制'}文件...")
+            action = '移动' if self.move_files else '复制'
+            # 进度和日志按节流发送：每 emit_every 个文件或距上次超过 PROGRESS_INTERVAL 秒发送一次
+            emit_every = max(1, total_files // 500)
+            # 热循环中使用的函数缓存为局部变量
+            basename = os.path.basename
+            dirname = os.path.dirname
+            join = os.path.join
+            ensure_unique = self.ensure_unique_filename
+            monotonic = time.monotonic
+            last_emit = time.monotonic()
+            done_since_emit = 0
             for idx, (src_path, tgt_dir) in enumerate(all_files, start=1):
                 if self.stop_event.is_set():
                     self.log("文件处理被用户中断，任务中止。")
-                    self.progress("中止")
+                    self.progress(Progress("abort", 0, 0))
                     return
-                original_name = os.path.basename(src_path)
-                unique_name = self.ensure_unique_filename(tgt_dir, original_name)
-                dest_path = os.path.join(tgt_dir, unique_name)
+                original_name = basename(src_path)
+                unique_name = ensure_unique(existing_names[tgt_dir], original_name)
+                dest_path = join(tgt_dir, unique_name)
                 try:
                     if self.move_files:
-                        shutil.move(src_path, dest_path)
+                        src_dir = dirname(src_path)
+                        if src_dir not in dir_devices:
+                            dir_devices[src_dir] = os.stat(src_dir).st_dev
+                        renamed = False
+                        if dir_devices[src_dir] == dest_dev:
+                            try:
+                                os.rename(src_path, dest_path)
+                                placed_paths.append(dest_path)
+                                renamed = True
+                            except OSError as e:
+                                # 同一文件系统的不同绑定挂载之间 st_dev 相同，rename 仍会报 EXDEV；
+                                # 此时改走复制，并记下该目录以后不再尝试 rename
+                                if e.errno != errno.EXDEV:
+                                    raise
+                                dir_devices[src_dir] = None
+                        if not renamed:
+                            if self.remove_duplicates:
+                                self.copy_and_record(src_path, dest_path, copied_rows)
+                                os.remove(src_path)
+                            else:
+                                shutil.move(src_path, dest_path)
+                                placed_paths.append(dest_path)
+                    elif self.remove_duplicates:
+                        self.copy_and_record(src_path, dest_path, copied_rows)
                     else:
-                        shutil.copy2(src_path, dest_path)
-                    self.log(f"[{idx}/{total_files}] {'移动' if self.move_files else '复制'}: {original_name} -> {unique_name}")
+                        copy_file(src_path, dest_path, self.keep_metadata)
+                        placed_paths.append(dest_path)
+                    done_since_emit += 1
+                    last_done = f"{original_name} -> {unique_name}"
                 except Exception as e:
                     self.log(f"[错误] 处理文件 {src_path} 出错: {e}")
-                self.progress(f"进度: {idx}/{total_files}")
+                now = monotonic()
+                if idx % emit_every == 0 or now - last_emit > PROGRESS_INTERVAL or idx == total_files:
+                    if done_since_emit:
+                        self.log(f"[{idx}/{total_files}] 已{action} {done_since_emit} 个文件，最近一个: {last_done}")
+                        done_since_emit = 0
+                    self.progress(Progress("tick", idx, total_files))
+                    last_emit = now
 
             self.log("文件全部整理完成。")
 
             if self.remove_duplicates:
                 self.log("开始重复文件扫描及删除...")
-                total_removed = 0
-                for check_dir in (img_dir, vid_dir, doc_dir):
-                    if self.stop_event.is_set():
-                        self.log("重复文件删除被用户中断，任务中止。")
-                        self.progress("中止")
-                        return
-                    hash_to_paths = {}
-                    for root, _, files in os.walk(check_dir):
-                        for f in files:
-                            full_path = os.path.join(root, f)
-                            try:
-                                file_hash = self.compute_file_hash(full_path)
-                            except Exception as e:
-                                self.log(f"[错误] 计算文件哈希失败: {full_path}，{e}")
-                                continue
-                            hash_to_paths.setdefault(file_hash, []).append(full_path)
-                    for dups in hash_to_paths.values():
-                        # 留一个，删除其余
-                        for dup_file in dups[1:]:
-                            if self.stop_event.is_set():
-                                self.log("重复文件删除被用户中断，任务中止。")
-                                self.progress("中止")
-                                return
-                            try:
-                                os.remove(dup_file)
-                                total_removed += 1
-                                self.log(f"删除重复文件: {dup_file}")
-                            except Exception as e:
-                                self.log(f"[错误] 删除失败: {dup_file}，{e}")
-                self.log(f"重复文件删除完成，共删除 {total_removed} 个文件。")
+                if not self.remove_duplicate_files((img_dir, vid_dir, doc_dir), copied_rows, placed_paths):
+                    self.log("重复文件删除被用户中断，任务中止。")
+                    self.progress(Progress("abort", 0, 0))
+                    return
             else:
                 self.log("用户选择跳过重复文件删除步骤。")
 
-            self.progress("完成")
+            self.progress(Progress("done", 0, 0))
             self.log("全部任务完成。")
         except Exception as ex:
             self.log(f"任务异常结束: {ex}")
-            self.progress("异常")
+            self.progress(Progress("error", 0, 0))
+
+# 日志窗口保留的最大行数
+MAX_LOG_LINES = 5000
 
 class FileOrganizerGUI:
     def __init__(self, root):
@@ -187,6 +613,8 @@ class FileOrganizerGUI:
         ttk.Checkbutton(frm_opts, text="移动文件（否则复制）", variable=self.move_var).pack(anchor="w", padx=5, pady=2)
         self.dup_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(frm_opts, text="完成后删除内容重复的文件（谨慎操作）", variable=self.dup_var).pack(anchor="w", padx=5, pady=2)
+        self.meta_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(frm_opts, text="复制时保留修改时间等元数据", variable=self.meta_var).pack(anchor="w", padx=5, pady=2)
 
         # --- 控制按钮 ---
         frm_ctrl = ttk.Frame(root)
@@ -268,7 +696,7 @@ class FileOrganizerGUI:
             src_dirs, dest,
             self.move_var.get(), self.dup_var.get(),
             self.log_queue, self.progress_queue,
-            self.stop_event
+            self.stop_event, self.meta_var.get()
         )
         self.worker_thread.start()
     
@@ -279,45 +707,34 @@ class FileOrganizerGUI:
             self.btn_stop.config(state="disabled")
 
     def process_log_queue(self):
+        # 一次取空队列，合并为一次 Text 插入，避免每条日志都刷新控件
+        messages = []
         try:
             while True:
-                msg = self.log_queue.get_nowait()
-                self.append_log(msg)
+                messages.append(self.log_queue.get_nowait())
         except queue.Empty:
             pass
+        if messages:
+            self.append_log("\n".join(messages))
         self.root.after(100, self.process_log_queue)
 
     def process_progress_queue(self):
-        updated = False
         try:
             while True:
                 msg = self.progress_queue.get_nowait()
-                if msg == "完成":
+                if msg.kind == "tick":
+                    self.pbar.config(value=msg.cur * 100 // msg.total)
+                    self.progress_var.set(f"处理中: {msg.cur}/{msg.total}")
+                    continue
+                if msg.kind == "done":
                     self.progress_var.set("任务完成。")
                     self.pbar.config(value=100)
-                    self.btn_start.config(state="normal")
-                    self.btn_stop.config(state="disabled")
-                elif msg == "中止":
+                elif msg.kind == "abort":
                     self.progress_var.set("任务已中止。")
-                    self.btn_start.config(state="normal")
-                    self.btn_stop.config(state="disabled")
-                elif msg == "异常":
+                elif msg.kind == "error":
                     self.progress_var.set("任务异常结束。")
-                    self.btn_start.config(state="normal")
-                    self.btn_stop.config(state="disabled")
-                elif msg.startswith("进度:"):
-                    parts = msg.split()
-                    try:
-                        # 格式： 进度: 当前/总数
-                        cur, total = parts[1].split("/")
-                        percentage = int(int(cur)/int(total)*100)
-                        self.pbar.config(value=percentage)
-                        self.progress_var.set(f"处理中: {cur}/{total}")
-                    except Exception:
-                        self.progress_var.set(msg)
-                else:
-                    self.progress_var.set(msg)
-                updated = True
+                self.btn_start.config(state="normal")
+                self.btn_stop.config(state="disabled")
         except queue.Empty:
             pass
         self.root.after(100, self.process_progress_queue)
@@ -325,6 +742,10 @@ class FileOrganizerGUI:
     def append_log(self, message):
         self.txt_log.config(state='normal')
         self.txt_log.insert("end", message + "\n")
+        # 只保留最近 MAX_LOG_LINES 行，防止文本控件过大变慢
+        line_count = int(self.txt_log.index("end-1c").split(".")[0])
+        if line_count > MAX_LOG_LINES:
+            self.txt_log.delete("1.0", f"{line_count - MAX_LOG_LINES + 1}.0")
         self.txt_log.see("end")
         self.txt_log.config(state='disabled')
 
@@ -1,22 +1,46 @@
 import os
 import re
+import gzip
+import hmac
+import time
+import queue
 import sqlite3
-from functools import wraps
-from io import BytesIO
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps, lru_cache
 
 from flask import (
     Flask,
     g,
-    render_template_string,
+    render_template,
     request,
     redirect,
     url_for,
     flash,
     session,
-    send_file
+    send_file,
+    Response
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+from markupsafe import Markup, escape
+from urllib.parse import quote
+
+# NumPy, when installed, vectorizes the CJK check for large notes
+try:
+    import numpy as np
+    hasNumpy = True
+except ImportError:
+    hasNumpy = False
+
+# argon2-cffi hashes in C with the GIL released; without it fall back to Werkzeug's PBKDF2
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import InvalidHashError, VerificationError
+    hasArgon2 = True
+except ImportError:
+    hasArgon2 = False
 
 # ----------------------------
 # Configuration
@@ -27,6 +51,14 @@ APPLICATION.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-very-secure-sec
 
 DATABASE_FILE_PATH = 'users_database.sqlite3'
 USER_NOTES_ROOT_DIRECTORY = 'user_notes'
+# Flush note data to disk on every save; skipped while running in debug mode
+APPLICATION.config['FSYNC_NOTES'] = os.getenv('FSYNC_NOTES', '1') != '0'
+BOOTSTRAP_CSS_URL = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css'
+BOOTSTRAP_CSS_INTEGRITY = 'sha384-9ndCyUaIbzAi2FUVXJi0CjmCapSmO7SnpJef0486qhLnuZ2cdeRhO02iuK6FUUVM'
+# Cached /notes pages at least this large also keep a gzip-compressed copy
+GZIP_MINIMUM_SIZE = 500
+# Number of idle SQLite connections kept open between requests
+DATABASE_POOL_SIZE = 8
 
 # ----------------------------
 # HTML Templates (Bootstrap 5)
@@ -38,7 +70,7 @@ BASE_TEMPLATE = """
 <head>
   <meta charset="utf-8">
   <title>Cloud Notepad</title>
-  <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+  <link href="{{ bootstrap_css_url }}" rel="stylesheet" integrity="{{ bootstrap_css_integrity }}" crossorigin="anonymous">
   <style>
     body { padding-top: 70px; }
     textarea { height: 300px; }
@@ -129,19 +161,7 @@ NOTES_LIST_TEMPLATE = """
 <hr>
 {% if notes_list %}
   <div class="list-group">
-  {% for note_filename in notes_list %}
-    <div class="list-group-item d-flex justify-content-between align-items-center">
-      <div>
-        <a href="{{ url_for('view_note_page', filename=note_filename) }}">{{ note_filename }}</a>
-      </div>
-      <div>
-        <a href="{{ url_for('edit_note_page', filename=note_filename) }}" class="btn btn-sm btn-outline-primary">Edit</a>
-        <form method="post" action="{{ url_for('delete_note_page', filename=note_filename) }}" style="display:inline;">
-          <button type="submit" class="btn btn-sm btn-outline-danger" onclick="return confirm('Are you sure you want to delete this note?');">Delete</button>
-        </form>
-      </div>
-    </div>
-  {% endfor %}
+  {{ rendered_items }}
   </div>
 {% else %}
   <p class="mt-3">No notes found.</p>
@@ -175,14 +195,42 @@ NOTE_EDIT_TEMPLATE = """
 {% endblock %}
 """
 
+# The stylesheet URL and hash are fixed, so bake them into the compiled templates
+APPLICATION.jinja_env.globals.update(
+    bootstrap_css_url=BOOTSTRAP_CSS_URL,
+    bootstrap_css_integrity=BOOTSTRAP_CSS_INTEGRITY
+)
+
+# Compile every template once at import. The compiled base template is passed as
+# base_template so that `{% extends %}` uses it directly instead of a loader lookup.
+COMPILED_TEMPLATES = {
+    name: APPLICATION.jinja_env.from_string(source)
+    for name, source in (
+        ('base', BASE_TEMPLATE),
+        ('home', HOME_TEMPLATE),
+        ('authentication', AUTHENTICATION_TEMPLATE),
+        ('notes_list', NOTES_LIST_TEMPLATE),
+        ('note_edit', NOTE_EDIT_TEMPLATE),
+    )
+}
+
 # ----------------------------
 # Utility Functions
 # ----------------------------
 
 def initialize_database():
     """Create the user_account table if it does not already exist."""
-    with sqlite3.connect(DATABASE_FILE_PATH) as database_connection:
-        database_connection.execute("""
+    is_new_database = not os.path.exists(DATABASE_FILE_PATH)
+    database_connection = sqlite3.connect(DATABASE_FILE_PATH)
+    try:
+        if is_new_database:
+            # page_size only takes effect before the first table is created,
+            # and cannot change once the database is in WAL mode
+            database_connection.executescript("""
+                PRAGMA page_size=8192;
+                PRAGMA journal_mode=WAL;
+            """)
+        database_connection.executescript("""
             CREATE TABLE IF NOT EXISTS user_account (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 username TEXT UNIQUE NOT NULL,
@@ -190,24 +238,63 @@ def initialize_database():
                 password_hash TEXT NOT NULL
             );
         """)
-        database_connection.commit()
+    finally:
+        database_connection.close()
+
+
+DATABASE_CONNECTION_POOL = queue.Queue(maxsize=DATABASE_POOL_SIZE)
+
+
+def open_database_connection():
+    """Open a long-lived SQLite connection in WAL mode, with row factory."""
+    # Autocommit mode: single statements need no implicit BEGIN/COMMIT round trip,
+    # and a larger statement cache keeps every query of the app prepared
+    connection = sqlite3.connect(
+        DATABASE_FILE_PATH,
+        check_same_thread=False,
+        cached_statements=256,
+        isolation_level=None
+    )
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL;")
+    connection.execute("PRAGMA synchronous=NORMAL;")
+    connection.execute("PRAGMA cache_size=-20000;")
+    connection.execute("PRAGMA temp_store=MEMORY;")
+    # Serve reads straight from the OS page cache instead of pread calls
+    connection.execute("PRAGMA mmap_size=67108864;")
+    return connection
 
 
 def get_database_connection():
-    """Get a SQLite connection stored in flask.g, with row factory."""
+    """Get a pooled SQLite connection stored in flask.g."""
     if 'database_connection' not in g:
-        connection = sqlite3.connect(DATABASE_FILE_PATH)
-        connection.row_factory = sqlite3.Row
-        g.database_connection = connection
+        try:
+            g.database_connection = DATABASE_CONNECTION_POOL.get_nowait()
+        except queue.Empty:
+            g.database_connection = open_database_connection()
     return g.database_connection
 
 
 @APPLICATION.teardown_appcontext
 def close_database_connection(error=None):
-    """Close the SQLite connection at the end of the request."""
+    """Return the SQLite connection to the pool at the end of the request."""
     database_connection = g.pop('database_connection', None)
     if database_connection is not None:
-        database_connection.close()
+        # Never hand a half-finished explicit transaction to the next request
+        if database_connection.in_transaction:
+            database_connection.rollback()
+        try:
+            DATABASE_CONNECTION_POOL.put_nowait(database_connection)
+        except queue.Full:
+            database_connection.close()
+
+
+@APPLICATION.after_request
+def add_stylesheet_preload(response):
+    """Ask browsers to start fetching the stylesheet as soon as an HTML page arrives."""
+    if response.status_code == 200 and response.mimetype == 'text/html':
+        response.headers['Link'] = f'<{BOOTSTRAP_CSS_URL}>; rel=preload; as=style; crossorigin=anonymous'
+    return response
 
 
 def login_required(view_function):
@@ -220,89 +307,279 @@ def login_required(view_function):
     return wrapped_function
 
 
+CHINESE_CHARACTER_PATTERN = re.compile('[\u4e00-\u9fff]')
+# Below this many characters the UTF-32 encode costs more than the regex scan it replaces
+NUMPY_SCAN_MIN_LENGTH = 64 * 1024
+
+
 def detect_chinese_characters(text):
     """Return True if text contains any Chinese character."""
-    return bool(re.search('[\u4e00-\u9fff]', text))
+    # str.isascii() reads a flag CPython keeps on every string, so pure-ASCII notes skip the scan
+    if text.isascii():
+        return False
+    if hasNumpy and len(text) >= NUMPY_SCAN_MIN_LENGTH:
+        codepoints = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        return bool(((codepoints >= 0x4e00) & (codepoints <= 0x9fff)).any())
+    return CHINESE_CHARACTER_PATTERN.search(text) is not None
+
+
+# Usernames and note names form a small, repeating set, so sanitizing is memoized
+cached_secure_filename = lru_cache(maxsize=4096)(secure_filename)
+
+
+# User folders already created by this process; makedirs runs once per folder, never per request
+KNOWN_USER_FOLDERS = set()
 
 
 def secure_user_folder(username):
     """Return the secure folder path for a given username, creating if needed."""
-    folder_name = secure_filename(username)
+    folder_name = cached_secure_filename(username)
     folder_path = os.path.join(USER_NOTES_ROOT_DIRECTORY, folder_name)
-    os.makedirs(folder_path, exist_ok=True)
+    if folder_path not in KNOWN_USER_FOLDERS:
+        os.makedirs(folder_path, exist_ok=True)
+        KNOWN_USER_FOLDERS.add(folder_path)
     return folder_path
 
 
+# username -> (folder mtime_ns, sorted note names)
+NOTES_LIST_CACHE = {}
+
+
 def list_notes_for_user(username):
     """Return sorted list of filenames in the user’s notes folder."""
     user_folder = secure_user_folder(username)
-    return sorted(os.listdir(user_folder))
+    folder_mtime = os.stat(user_folder).st_mtime_ns
+    cached = NOTES_LIST_CACHE.get(username)
+    if cached is not None and cached[0] == folder_mtime:
+        return cached[1]
+    with os.scandir(user_folder) as entries:
+        notes_list = sorted(entry.name for entry in entries if entry.is_file())
+    NOTES_LIST_CACHE[username] = (folder_mtime, notes_list)
+    return notes_list
+
+
+NOTE_ITEM_HTML = (
+    '<div class="list-group-item d-flex justify-content-between align-items-center">'
+    '<div><a href="{view_url}">{name}</a></div>'
+    '<div><a href="{edit_url}" class="btn btn-sm btn-outline-primary">Edit</a> '
+    '<form method="post" action="{delete_url}" style="display:inline;">'
+    '<button type="submit" class="btn btn-sm btn-outline-danger" '
+    'onclick="return confirm(\'Are you sure you want to delete this note?\');">Delete</button>'
+    '</form></div></div>\n'
+)
+# endpoint -> (URL before the filename, URL after it); resolved on first use inside a request
+NOTE_URL_PARTS = {}
+
+
+def note_url_parts(endpoint):
+    """Return the fixed parts of a per-note URL around the filename."""
+    if endpoint not in NOTE_URL_PARTS:
+        prefix, _, suffix = url_for(endpoint, filename='NOTE').rpartition('NOTE')
+        NOTE_URL_PARTS[endpoint] = (prefix, suffix)
+    return NOTE_URL_PARTS[endpoint]
+
+
+def render_note_items(notes_list):
+    """Build the notes list markup in one join instead of a Jinja loop with url_for calls."""
+    view_prefix, view_suffix = note_url_parts('view_note_page')
+    edit_prefix, edit_suffix = note_url_parts('edit_note_page')
+    delete_prefix, delete_suffix = note_url_parts('delete_note_page')
+    items = []
+    for note_filename in notes_list:
+        quoted_name = quote(note_filename, safe='')
+        items.append(NOTE_ITEM_HTML.format(
+            name=escape(note_filename),
+            view_url=view_prefix + quoted_name + view_suffix,
+            edit_url=edit_prefix + quoted_name + edit_suffix,
+            delete_url=delete_prefix + quoted_name + delete_suffix
+        ))
+    return Markup(''.join(items))
+
+
+# username -> (folder mtime_ns, rendered /notes page bytes, gzipped bytes or None), least recently used first.
+# Only this page is compressed in-process, once per render; other responses are left to the front proxy.
+NOTES_PAGE_CACHE = OrderedDict()
+NOTES_PAGE_CACHE_SIZE = 1024
+NOTES_PAGE_CACHE_LOCK = threading.Lock()
+
+
+def notes_page_response(page_bytes, gzipped_bytes):
+    """Serve the rendered list page, using its precompressed copy when the client accepts gzip."""
+    if gzipped_bytes is not None and request.accept_encodings['gzip']:
+        response = Response(gzipped_bytes, mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(page_bytes, mimetype='text/html')
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def invalidate_user_notes_cache(username):
+    """Forget the cached listing and rendered list page of a user."""
+    NOTES_LIST_CACHE.pop(username, None)
+    with NOTES_PAGE_CACHE_LOCK:
+        NOTES_PAGE_CACHE.pop(username, None)
+
+
+def sniff_note_encoding(raw_data):
+    """Return the encoding of stored note bytes, judged from the BOM."""
+    # write_note_file's UTF-16 output always starts with a BOM; anything else is UTF-8
+    if raw_data[:2] in (b'\xff\xfe', b'\xfe\xff'):
+        return 'utf-16'
+    return 'utf-8'
+
+
+def note_file_path(username, filename):
+    """Return the absolute path of an existing note, or None if not found."""
+    secure_name = cached_secure_filename(filename)
+    file_path = os.path.abspath(os.path.join(secure_user_folder(username), secure_name))
+    if not os.path.isfile(file_path):
+        return None
+    return file_path
+
+
+def read_note_bytes(username, filename):
+    """Return (raw bytes, encoding) of a note, or None if not found."""
+    file_path = note_file_path(username, filename)
+    if file_path is None:
+        return None
+    with open(file_path, 'rb') as file_handle:
+        raw_data = file_handle.read()
+    return raw_data, sniff_note_encoding(raw_data)
 
 
 def read_note_file(username, filename):
     """Read and return the content of a note, or None if not found."""
-    secure_name = secure_filename(filename)
-    file_path = os.path.join(secure_user_folder(username), secure_name)
-    if not os.path.isfile(file_path):
+    note = read_note_bytes(username, filename)
+    if note is None:
         return None
-    # Always open in binary to detect encoding if needed
-    raw_data = open(file_path, 'rb').read()
-    try:
-        # Try UTF-16 first
-        return raw_data.decode('utf-16')
-    except UnicodeError:
-        # Fallback to UTF-8
-        return raw_data.decode('utf-8')
+    raw_data, encoding = note
+    return raw_data.decode(encoding)
 
 
 def write_note_file(username, filename, content, overwrite=False):
     """Write content to a note. Return True on success, False on conflict/not found."""
-    secure_name = secure_filename(filename)
+    secure_name = cached_secure_filename(filename)
     if not secure_name.lower().endswith('.txt'):
         secure_name += '.txt'
     file_path = os.path.join(secure_user_folder(username), secure_name)
-    if os.path.exists(file_path) and not overwrite:
-        return False
-    # Choose encoding: UTF-16 if Chinese, else UTF-8
+    # Choose encoding: UTF-16 if Chinese, else UTF-8; encode once and write the bytes directly
     chosen_encoding = 'utf-16' if detect_chinese_characters(content) else 'utf-8'
-    with open(file_path, 'w', encoding=chosen_encoding) as file_handle:
-        file_handle.write(content)
+    note_bytes = memoryview(content.encode(chosen_encoding))
+    # O_EXCL makes "create only if absent" a single atomic open
+    open_flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | (0 if overwrite else os.O_EXCL)
+    try:
+        file_descriptor = os.open(file_path, open_flags, 0o600)
+    except FileExistsError:
+        return False
+    try:
+        while note_bytes:
+            note_bytes = note_bytes[os.write(file_descriptor, note_bytes):]
+        if APPLICATION.config['FSYNC_NOTES'] and not APPLICATION.debug:
+            getattr(os, 'fdatasync', os.fsync)(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+    invalidate_user_notes_cache(username)
     return True
 
 
 def delete_note_file_for_user(username, filename):
     """Delete a note file if it exists. Return True if deleted, else False."""
-    secure_name = secure_filename(filename)
+    secure_name = cached_secure_filename(filename)
     file_path = os.path.join(secure_user_folder(username), secure_name)
     if os.path.isfile(file_path):
         os.remove(file_path)
+        invalidate_user_notes_cache(username)
         return True
     return False
 
 
+PASSWORD_HASHER = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1) if hasArgon2 else None
+# Password hashing runs here: argon2 and hashlib's PBKDF2 both release the GIL, so threads use
+# every core, and capping the pool at the core count keeps a login storm from starving other requests
+KDF_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='kdf')
+
+
+def run_kdf(function, *arguments):
+    """Run a password hashing function on the KDF pool and wait for its result."""
+    return KDF_POOL.submit(function, *arguments).result()
+
+
+def hash_password(password):
+    """Hash a password with argon2 when available, else Werkzeug's default."""
+    if hasArgon2:
+        return PASSWORD_HASHER.hash(password)
+    return generate_password_hash(password)
+
+
+def verify_password(password_hash, password):
+    """Check a password against an argon2 or Werkzeug hash."""
+    if password_hash.startswith('$argon2'):
+        if not hasArgon2:
+            return False
+        try:
+            return PASSWORD_HASHER.verify(password_hash, password)
+        except (InvalidHashError, VerificationError):
+            return False
+    return check_password_hash(password_hash, password)
+
+
+def password_needs_rehash(password_hash):
+    """Return True if a stored hash should be upgraded to the current argon2 settings."""
+    if not hasArgon2:
+        return False
+    if not password_hash.startswith('$argon2'):
+        return True
+    return PASSWORD_HASHER.check_needs_rehash(password_hash)
+
+
+# Queries are module constants so each connection's statement cache reuses their prepared form
+SQL_CREATE_USER = "INSERT INTO user_account (username, email_address, password_hash) VALUES (?, ?, ?);"
+SQL_LOGIN = "SELECT id, username, password_hash FROM user_account WHERE email_address = ?;"
+SQL_UPDATE_PASSWORD_HASH = "UPDATE user_account SET password_hash = ? WHERE id = ?;"
+
+
 def create_user_account(username, email_address, password):
     """Insert a new user into the database. Return True on success, False on duplication."""
-    password_hash = generate_password_hash(password)
+    password_hash = run_kdf(hash_password, password)
     connection = get_database_connection()
     try:
-        connection.execute(
-            "INSERT INTO user_account (username, email_address, password_hash) VALUES (?, ?, ?);",
-            (username, email_address, password_hash)
-        )
-        connection.commit()
+        connection.execute(SQL_CREATE_USER, (username, email_address, password_hash))
         return True
     except sqlite3.IntegrityError:
         return False
 
 
+# Successful logins are remembered for this many seconds, keyed by an HMAC of the password
+CREDENTIAL_CACHE_SECONDS = 60
+CREDENTIAL_CACHE_SIZE = 1024
+VERIFIED_CREDENTIALS = OrderedDict()
+VERIFIED_CREDENTIALS_LOCK = threading.Lock()
+
+
 def authenticate_user_credentials(email_address, password):
     """Check credentials; return user dict on success, None on failure."""
+    password_mac = hmac.new(
+        APPLICATION.config['SECRET_KEY'].encode(), password.encode(), 'sha256'
+    ).digest()
+    cache_key = (email_address, password_mac)
+    now = time.monotonic()
+    with VERIFIED_CREDENTIALS_LOCK:
+        cached = VERIFIED_CREDENTIALS.get(cache_key)
+    if cached is not None and cached[0] > now:
+        return {'id': cached[1], 'username': cached[2]}
     connection = get_database_connection()
-    row = connection.execute(
-        "SELECT id, username, password_hash FROM user_account WHERE email_address = ?;",
-        (email_address,)
-    ).fetchone()
-    if row and check_password_hash(row['password_hash'], password):
+    row = connection.execute(SQL_LOGIN, (email_address,)).fetchone()
+    if row and run_kdf(verify_password, row['password_hash'], password):
+        # Upgrade older PBKDF2 hashes the first time the plain password is available
+        if password_needs_rehash(row['password_hash']):
+            connection.execute(SQL_UPDATE_PASSWORD_HASH, (run_kdf(hash_password, password), row['id']))
+        # Only successes are cached, so a failed attempt never blocks a later correct one
+        with VERIFIED_CREDENTIALS_LOCK:
+            VERIFIED_CREDENTIALS[cache_key] = (now + CREDENTIAL_CACHE_SECONDS, row['id'], row['username'])
+            VERIFIED_CREDENTIALS.move_to_end(cache_key)
+            while len(VERIFIED_CREDENTIALS) > CREDENTIAL_CACHE_SIZE:
+                VERIFIED_CREDENTIALS.popitem(last=False)
         return {'id': row['id'], 'username': row['username']}
     return None
 
@@ -313,7 +590,7 @@ def authenticate_user_credentials(email_address, password):
 
 @APPLICATION.route('/')
 def home_page():
-    return render_template_string(HOME_TEMPLATE, base_template=BASE_TEMPLATE)
+    return render_template(COMPILED_TEMPLATES['home'], base_template=COMPILED_TEMPLATES['base'])
 
 
 @APPLICATION.route('/register', methods=['GET', 'POST'])
@@ -333,9 +610,9 @@ def register_page():
                 return redirect(url_for('login_page'))
             else:
                 flash('Username or email address already exists.', 'danger')
-    return render_template_string(
-        AUTHENTICATION_TEMPLATE,
-        base_template=BASE_TEMPLATE,
+    return render_template(
+        COMPILED_TEMPLATES['authentication'],
+        base_template=COMPILED_TEMPLATES['base'],
         page_title='Register',
         is_registration=True
     )
@@ -353,9 +630,9 @@ def login_page():
             session['username'] = user_record['username']
             return redirect(url_for('list_notes_page'))
         flash('Invalid email address or password.', 'danger')
-    return render_template_string(
-        AUTHENTICATION_TEMPLATE,
-        base_template=BASE_TEMPLATE,
+    return render_template(
+        COMPILED_TEMPLATES['authentication'],
+        base_template=COMPILED_TEMPLATES['base'],
         page_title='Login',
         is_registration=False
     )
@@ -372,12 +649,32 @@ def logout_page():
 @login_required
 def list_notes_page():
     username = session['username']
+    folder_mtime = os.stat(secure_user_folder(username)).st_mtime_ns
+    # A page carrying flash messages is one-off, so it is neither served from nor stored in the cache
+    has_flashes = '_flashes' in session
+    if not has_flashes:
+        with NOTES_PAGE_CACHE_LOCK:
+            cached = NOTES_PAGE_CACHE.get(username)
+            if cached is not None and cached[0] == folder_mtime:
+                NOTES_PAGE_CACHE.move_to_end(username)
+                return notes_page_response(cached[1], cached[2])
     notes_list = list_notes_for_user(username)
-    return render_template_string(
-        NOTES_LIST_TEMPLATE,
-        base_template=BASE_TEMPLATE,
-        notes_list=notes_list
+    page_html = render_template(
+        COMPILED_TEMPLATES['notes_list'],
+        base_template=COMPILED_TEMPLATES['base'],
+        notes_list=notes_list,
+        rendered_items=render_note_items(notes_list)
     )
+    if has_flashes:
+        return page_html
+    page_bytes = page_html.encode('utf-8')
+    gzipped_bytes = gzip.compress(page_bytes, compresslevel=6) if len(page_bytes) >= GZIP_MINIMUM_SIZE else None
+    with NOTES_PAGE_CACHE_LOCK:
+        NOTES_PAGE_CACHE[username] = (folder_mtime, page_bytes, gzipped_bytes)
+        NOTES_PAGE_CACHE.move_to_end(username)
+        while len(NOTES_PAGE_CACHE) > NOTES_PAGE_CACHE_SIZE:
+            NOTES_PAGE_CACHE.popitem(last=False)
+    return notes_page_response(page_bytes, gzipped_bytes)
 
 
 @APPLICATION.route('/notes/new', methods=['GET', 'POST'])
@@ -390,9 +687,9 @@ def create_note_page():
             flash('Note created successfully.', 'success')
             return redirect(url_for('list_notes_page'))
         flash('A note with that filename already exists.', 'danger')
-    return render_template_string(
-        NOTE_EDIT_TEMPLATE,
-        base_template=BASE_TEMPLATE,
+    return render_template(
+        COMPILED_TEMPLATES['note_edit'],
+        base_template=COMPILED_TEMPLATES['base'],
         filename=None,
         note_content=''
     )
@@ -409,9 +706,9 @@ def edit_note_page(filename):
             return redirect(url_for('list_notes_page'))
         flash('Failed to update note.', 'danger')
     existing_content = read_note_file(username, filename) or ''
-    return render_template_string(
-        NOTE_EDIT_TEMPLATE,
-        base_template=BASE_TEMPLATE,
+    return render_template(
+        COMPILED_TEMPLATES['note_edit'],
+        base_template=COMPILED_TEMPLATES['base'],
         filename=filename,
         note_content=existing_content
     )
@@ -430,20 +727,28 @@ def delete_note_page(filename):
 @APPLICATION.route('/notes/<filename>/view')
 @login_required
 def view_note_page(filename):
-    note_text = read_note_file(session['username'], filename)
-    if note_text is None:
+    file_path = note_file_path(session['username'], filename)
+    if file_path is None:
         flash('Note not found.', 'warning')
         return redirect(url_for('list_notes_page'))
-    # Prepare file bytes for download
-    # Use UTF-16 if Chinese, else UTF-8
-    encoding_for_download = 'utf-16' if detect_chinese_characters(note_text) else 'utf-8'
-    note_bytes = note_text.encode(encoding_for_download)
-    return send_file(
-        BytesIO(note_bytes),
-        mimetype=f'text/plain; charset={encoding_for_download}',
+    # Send the stored file as-is; it already uses UTF-16 for Chinese, else UTF-8.
+    # ETag and Last-Modified come from the file's stat, so a matching request gets a 304
+    response = send_file(
+        file_path,
+        mimetype='text/plain',
         as_attachment=True,
-        download_name=filename
+        download_name=filename,
+        conditional=True
     )
+    if response.status_code == 304:
+        # Nothing is sent, so there is no need to open the file for its BOM
+        return response
+    # Only the BOM is read here, the body goes out through the WSGI file wrapper.
+    with open(file_path, 'rb') as file_handle:
+        encoding_for_download = sniff_note_encoding(file_handle.read(2))
+    # Set the sniffed charset directly; passing it inside mimetype makes Werkzeug append a second one
+    response.headers['Content-Type'] = f'text/plain; charset={encoding_for_download}'
+    return response
 
 
 # ----------------------------
@@ -452,5 +757,8 @@ def view_note_page(filename):
 
 if __name__ == '__main__':
     os.makedirs(USER_NOTES_ROOT_DIRECTORY, exist_ok=True)
+    # Existing user folders need no mkdir on first access
+    with os.scandir(USER_NOTES_ROOT_DIRECTORY) as entries:
+        KNOWN_USER_FOLDERS.update(entry.path for entry in entries if entry.is_dir())
     initialize_database()
     APPLICATION.run(debug=True)
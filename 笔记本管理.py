@@ -1,18 +1,22 @@
 # app.py
 import os
 import time
+import atexit
+import queue
+import hashlib
+import threading
 from datetime import datetime, timedelta
-from functools import wraps
+from functools import wraps, lru_cache
 from pathlib import Path
-from math import ceil
+from concurrent.futures import ThreadPoolExecutor
 
 from flask import Flask, request, jsonify, make_response
 from flask_sqlalchemy import SQLAlchemy
 
 import jwt
-from passlib.hash import bcrypt
+from passlib.context import CryptContext
 
-from whoosh import index
+from whoosh import index as whoosh_index
 from whoosh.fields import Schema, TEXT, ID, DATETIME
 from whoosh.qparser import MultifieldParser, OrGroup
 import jieba
@@ -21,11 +25,27 @@ import jieba
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-change-me")
 JWT_ALGO = "HS256"
 JWT_EXP_HOURS = 24
+TOKEN_CACHE_TTL = 60      # 已验证令牌的缓存秒数，也是吊销后仍可能放行的最长时间
+TOKEN_CACHE_MAX = 10000
+# bcrypt 成本因子：每加 1 耗时翻倍；高于此值的旧哈希在下次登录成功时按此值重算
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "10"))
+INDEX_BATCH_SIZE = 256    # 后台索引线程每批最多合并的写操作数
+INDEX_BATCH_DELAY = 0.1   # 凑批最多等待的秒数，也是新笔记可被搜到的最大延迟
+INDEX_LOCK_TIMEOUT = 5.0  # 索引被其他进程锁住时每次等待的秒数，超时后重试
 
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = str(BASE_DIR / "notes.db")
 WHOOSH_DIR = str(BASE_DIR / "whoosh_index")
 
+# bcrypt 计算在 C 扩展里进行并释放 GIL：放到与核数等大的线程池中执行，
+# 多个登录可并行用满所有核，同时限制并发数，避免登录高峰挤占其他请求
+KDF_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="kdf")
+
+def run_kdf(fn, *args):
+    return KDF_POOL.submit(fn, *args).result()
+
+pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=BCRYPT_ROUNDS, bcrypt__max_rounds=BCRYPT_ROUNDS)
+
 # ========== Flask + DB ==========
 app = Flask(__name__, static_folder=None)
 app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_PATH}"
@@ -40,7 +60,10 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def verify_password(self, pw):
-        return bcrypt.verify(pw, self.password_hash)
+        ok, new_hash = run_kdf(pwd_context.verify_and_update, pw, self.password_hash)
+        if new_hash:
+            self.password_hash = new_hash
+        return ok
 
 class Note(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -49,6 +72,10 @@ class Note(db.Model):
     author_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 作者随笔记一起 JOIN 查出，to_dict 取用户名时不再单独查询
+    author = db.relationship("User", lazy="joined")
+    # “我的笔记”按作者过滤、按创建时间倒序分页，过滤和排序都由这个索引直接给出
+    __table_args__ = (db.Index("ix_note_author_created", author_id, created_at.desc()),)
 
     def to_dict(self, include_author=False):
         d = {
@@ -60,8 +87,7 @@ class Note(db.Model):
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
         if include_author:
-            user = User.query.get(self.author_id)
-            d["author_username"] = user.username if user else None
+            d["author_username"] = self.author.username if self.author else None
         return d
 
 # ========== Whoosh ==========
@@ -75,33 +101,120 @@ schema = Schema(
 
 def init_whoosh():
     os.makedirs(WHOOSH_DIR, exist_ok=True)
-    if not index.exists_in(WHOOSH_DIR):
-        index.create_in(WHOOSH_DIR, schema)
+    if not whoosh_index.exists_in(WHOOSH_DIR):
+        whoosh_index.create_in(WHOOSH_DIR, schema)
+
+# Index 对象可跨请求、跨线程复用：只在第一次用到时 open_dir，
+# 之后每次 searcher()/writer() 都会读取最新一代的 TOC，能看到后续提交
+_whoosh_ix = None
+_whoosh_ix_lock = threading.Lock()
 
 def get_whoosh_index():
-    return index.open_dir(WHOOSH_DIR)
+    global _whoosh_ix
+    if _whoosh_ix is None:
+        with _whoosh_ix_lock:
+            if _whoosh_ix is None:
+                _whoosh_ix = whoosh_index.open_dir(WHOOSH_DIR)
+    return _whoosh_ix
+
+# 导入时就加载分词词典，避免第一次分词的请求承担加载耗时
+jieba.initialize()
 
 def jieba_tokenize(text):
     return " ".join(jieba.cut_for_search(text or ""))
 
+# 搜索词短且高度重复，分词结果按原文缓存；笔记正文又长又几乎不重复，仍走 jieba_tokenize
+@lru_cache(maxsize=4096)
+def tokenize_query(q):
+    return jieba_tokenize(q)
+
+# 索引写入交给后台线程：请求只把操作放进队列就返回，分词和 commit（落盘 + 段合并）
+# 都在后台进行；后台线程把一段时间内的多次写入合并成一次 commit。
+# 本进程只有这一个线程写索引，各批按入队顺序依次提交
+index_queue = queue.Queue()
+INDEX_QUEUE_STOP = None   # 放入队列后写线程提交完手头的操作即退出
+
 def add_or_update_index(note: Note):
-    ix = get_whoosh_index()
-    writer = ix.writer()
-    writer.update_document(
-        note_id=str(note.id),
-        title=jieba_tokenize(note.title),
-        content=jieba_tokenize(note.content),
-        author_id=str(note.author_id),
-        created_at=note.created_at
-    )
-    writer.commit()
+    index_queue.put(("update", note.id, note.title, note.content, note.author_id, note.created_at))
 
 def delete_from_index(note_id: int):
-    ix = get_whoosh_index()
-    writer = ix.writer()
-    writer.delete_by_term("note_id", str(note_id))
+    index_queue.put(("delete", note_id))
+
+def apply_index_batch(ops):
+    # 同一笔记在一批里只保留最后一次操作：同一 writer 里先加后改/删的文档彼此看不到，
+    # 不合并会留下重复或已删除的文档
+    latest = {}
+    for op in ops:
+        latest.pop(op[1], None)
+        latest[op[1]] = op
+    # 分词放在拿写锁之前，缩短持锁时间
+    docs = []
+    for op in latest.values():
+        if op[0] == "update":
+            _, note_id, title, content, author_id, created_at = op
+            docs.append((note_id, dict(
+                note_id=str(note_id),
+                title=jieba_tokenize(title),
+                content=jieba_tokenize(content),
+                author_id=str(author_id),
+                created_at=created_at
+            )))
+        else:
+            docs.append((op[1], None))
+    # 其他进程持有写锁时就地等待重试，不另起线程，保证这一批在下一批之前提交
+    while True:
+        try:
+            writer = get_whoosh_index().writer(timeout=INDEX_LOCK_TIMEOUT)
+            break
+        except whoosh_index.LockError:
+            app.logger.warning("whoosh index is locked by another writer, retrying")
+    try:
+        for note_id, fields in docs:
+            if fields is None:
+                writer.delete_by_term("note_id", str(note_id))
+            else:
+                writer.update_document(**fields)
+    except Exception:
+        writer.cancel()
+        raise
     writer.commit()
 
+def index_writer_loop():
+    stopping = False
+    while not stopping:
+        first = index_queue.get()
+        ops = [] if first is INDEX_QUEUE_STOP else [first]
+        stopping = first is INDEX_QUEUE_STOP
+        deadline = time.monotonic() + INDEX_BATCH_DELAY
+        while not stopping and len(ops) < INDEX_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                op = index_queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if op is INDEX_QUEUE_STOP:
+                stopping = True
+            else:
+                ops.append(op)
+        try:
+            if ops:
+                apply_index_batch(ops)
+        except Exception:
+            app.logger.exception("whoosh index batch failed")
+        for _ in range(len(ops) + stopping):
+            index_queue.task_done()
+
+index_writer = threading.Thread(target=index_writer_loop, name="whoosh-writer", daemon=True)
+index_writer.start()
+
+@atexit.register
+def flush_index_queue():
+    # 进程退出前让写线程把队列里剩下的操作全部提交，索引不会与数据库脱节
+    index_queue.put(INDEX_QUEUE_STOP)
+    index_writer.join()
+
 # ========== JWT ==========
 def create_token(user_id):
     payload = {
@@ -111,12 +224,25 @@ def create_token(user_id):
     }
     return jwt.encode(payload, SECRET_KEY, algorithm=JWT_ALGO)
 
+# 已验证令牌的进程内缓存：令牌摘要 -> (过期时间, user_id)。客户端每次请求都带同一个令牌，
+# 命中后省去 HMAC 验签和 JSON 解析；键只存摘要不存原文，失败结果不缓存
+token_cache = {}
+
 def decode_token(token):
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    now = time.time()
+    cached = token_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGO])
-        return int(payload.get("sub"))
+        user_id = int(payload.get("sub"))
     except Exception:
         return None
+    if len(token_cache) >= TOKEN_CACHE_MAX:
+        token_cache.clear()
+    token_cache[key] = (min(now + TOKEN_CACHE_TTL, payload.get("exp", now)), user_id)
+    return user_id
 
 def auth_required(f):
     @wraps(f)
@@ -136,16 +262,11 @@ def auth_required(f):
 @app.before_first_request
 def setup():
     db.create_all()
+    # create_all 不会给已存在的表补建新索引
+    for idx in Note.__table__.indexes:
+        idx.create(db.engine, checkfirst=True)
     init_whoosh()
 
-# ========== 辅助分页 ==========
-def paginate_query_queryset(items, page, per_page):
-    total = len(items)
-    pages = max(1, ceil(total / per_page))
-    start = (page - 1) * per_page
-    end = start + per_page
-    return items[start:end], total, pages
-
 # ========== 用户 API ==========
 @app.route("/api/register", methods=["POST"])
 def register():
@@ -156,7 +277,7 @@ def register():
         return jsonify({"error": "username and password required"}), 400
     if User.query.filter_by(username=username).first():
         return jsonify({"error": "username taken"}), 400
-    pw_hash = bcrypt.hash(password)
+    pw_hash = run_kdf(pwd_context.hash, password)
     user = User(username=username, password_hash=pw_hash)
     db.session.add(user)
     db.session.commit()
@@ -173,6 +294,8 @@ def login():
     user = User.query.filter_by(username=username).first()
     if not user or not user.verify_password(password):
         return jsonify({"error": "invalid credentials"}), 401
+    if user in db.session.dirty:
+        db.session.commit()
     token = create_token(user.id)
     return jsonify({"id": user.id, "username": user.username, "token": token})
 
@@ -237,14 +360,16 @@ def delete_note(note_id):
 def my_notes():
     page = max(1, int(request.args.get("page", 1)))
     per_page = min(100, max(1, int(request.args.get("per_page", 10))))
-    q = Note.query.filter_by(author_id=request.user_id).order_by(Note.created_at.desc()).all()
-    items, total, pages = paginate_query_queryset(q, page, per_page)
+    # 只取当前页：SQL 端 LIMIT/OFFSET 加一次 COUNT，不再把全部笔记读进内存再切片
+    pagination = Note.query.filter_by(author_id=request.user_id).order_by(Note.created_at.desc()).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
     return jsonify({
-        "notes": [n.to_dict() for n in items],
+        "notes": [n.to_dict() for n in pagination.items],
         "page": page,
         "per_page": per_page,
-        "total": total,
-        "pages": pages
+        "total": pagination.total,
+        "pages": max(1, pagination.pages)
     })
 
 # ========== 搜索 API（Whoosh）=========
@@ -257,19 +382,17 @@ def search():
     per_page = min(100, max(1, int(request.args.get("per_page", 10))))
 
     ix = get_whoosh_index()
-    q_tok = jieba_tokenize(q)
+    q_tok = tokenize_query(q)
     parser = MultifieldParser(["title", "content"], schema=ix.schema, group=OrGroup)
     parsed = parser.parse(q_tok)
 
     with ix.searcher() as searcher:
         results = searcher.search(parsed, limit=page * per_page, sortedby="created_at", reverse=True)
         start = (page - 1) * per_page
-        hits = results[start:start + per_page]
-        notes = []
-        for hit in hits:
-            note = Note.query.get(int(hit["note_id"]))
-            if note:
-                notes.append(note.to_dict(include_author=True))
+        hit_ids = [int(hit["note_id"]) for hit in results[start:start + per_page]]
+    # 一次 IN 查询取回本页全部笔记（连同作者），再按搜索结果的顺序排列
+    notes_by_id = {note.id: note for note in Note.query.filter(Note.id.in_(hit_ids)).all()} if hit_ids else {}
+    notes = [notes_by_id[note_id].to_dict(include_author=True) for note_id in hit_ids if note_id in notes_by_id]
     return jsonify({
         "q": q,
         "page": page,
@@ -560,5 +683,8 @@ def index():
     return resp
 
 # ========== 运行 ==========
+# 开发服务器仅供本地调试。部署时用多进程 + 多线程的 WSGI 服务器，让 SQLite 读取、
+# Whoosh 提交和 bcrypt 计算在不同线程间重叠执行：
+#   gunicorn -k gthread -w 4 --threads 8 -b 0.0.0.0:5000 "笔记本管理:app"
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)